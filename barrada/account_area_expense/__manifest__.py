@@ -1,6 +1,6 @@
 {
     'name': 'Gastos por Áreas',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Human Resources/Expenses',
     'sequence': 35,
     'summary': 'Manage area expenses',
@@ -15,11 +15,23 @@ Al ser aprobadas estas solicitudes los gastos pueden reintegrarse al área o cre
         'account',
         'hr',
     ],
+    'external_dependencies': {
+        'python': ['openpyxl'],
+    },
     'data': [
         'security/account_area_expense_security.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/account_area_expense_views.xml',
         'views/account_area_expense_sheet_views.xml',
+        'views/account_area_expense_report_views.xml',
+        'views/account_area_budget_views.xml',
+        'views/account_area_expense_stat_views.xml',
+        'views/account_area_expense_job_views.xml',
+        'wizard/account_area_expense_import_views.xml',
+        'wizard/account_area_expense_sheet_export_views.xml',
+        'wizard/account_area_expense_sheet_refuse_views.xml',
+        'wizard/account_area_expense_approve_duplicate_views.xml',
         'views/menuitems.xml',
         # 'views/account_menu.xml',
     ],
@@ -0,0 +1,25 @@
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.http import content_disposition, request
+
+
+class AccountAreaExpenseController(http.Controller):
+
+    @http.route('/account_area_expense/sheet_export/<int:wizard_id>', type='http', auth='user')
+    def sheet_export(self, wizard_id, **kwargs):
+        """ Stream the XLSX export of the wizard from a temporary file, which is removed once sent """
+        wizard = request.env['account.area.expense.sheet.export'].browse(wizard_id).exists()
+        if not wizard:
+            raise request.not_found()
+        output = tempfile.TemporaryFile()
+        wizard._write_xlsx(output)
+        output.seek(0)
+        response = request.make_response(wrap_file(request.httprequest.environ, output), headers=[
+            ('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+            ('Content-Disposition', content_disposition(wizard._get_export_filename())),
+        ])
+        response.direct_passthrough = True
+        return response
@@ -0,0 +1,9 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # The rows were aggregated once per analytic plan and without the undistributed share of the expenses: rebuild them
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    cr.execute("UPDATE account_area_expense_sheet SET report_dirty = TRUE")
+    env['account.area.expense.sheet'].invalidate_model(['report_dirty'])
+    env['account.area.expense.report']._refresh_dirty_sheets()
@@ -3,3 +3,10 @@ from . import account_area_expense_sheet
 from . import account_move
 from . import account_move_line
 from . import account_payment
+from . import ir_attachment
+from . import account_area_expense_report
+from . import account_area_budget
+from . import account_area_expense_generator
+from . import account_area_expense_stat
+from . import account_area_expense_job
+from . import mail_thread
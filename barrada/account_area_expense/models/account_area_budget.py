@@ -0,0 +1,153 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.osv import expression
+from odoo.tools import SQL
+
+
+class AccountAreaBudget(models.Model):
+    """
+    Budget of an area manager for a period. The committed, approved and paid totals are running counters updated by the
+    state transitions of the area expenses before each commit (see `AccountAreaExpense._update_area_budget_counters`),
+    so checking a budget only reads its own row. They are rebuilt when a budget is created or moved to another area or
+    period.
+    """
+    _name = "account.area.budget"
+    _description = "Area Budget"
+    _order = "date_from desc, id desc"
+    _check_company_auto = True
+
+    name = fields.Char("Name", required=True)
+    area_manager_id = fields.Many2one('res.users', "Area Manager", required=True, index=True)
+    company_id = fields.Many2one('res.company', "Company", required=True, default=lambda self: self.env.company)
+    currency_id = fields.Many2one(related='company_id.currency_id', readonly=True)
+    date_from = fields.Date("From", required=True)
+    date_to = fields.Date("Until", required=True)
+    amount = fields.Monetary("Budget", currency_field='currency_id')
+
+    committed_amount = fields.Monetary("Committed", currency_field='currency_id', readonly=True, copy=False,
+                                       help="Reported and submitted expenses")
+    approved_amount = fields.Monetary("Approved", currency_field='currency_id', readonly=True, copy=False)
+    paid_amount = fields.Monetary("Paid", currency_field='currency_id', readonly=True, copy=False)
+    available_amount = fields.Monetary("Available", currency_field='currency_id', compute='_compute_available_amount')
+
+    _sql_constraints = [
+        ('date_check', 'CHECK(date_from <= date_to)', 'The start date of the budget must be before its end date.'),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        budgets = super().create(vals_list)
+        # Count the expenses existing before the budget
+        budgets.action_recompute_consumption()
+        return budgets
+
+    def write(self, vals):
+        res = super().write(vals)
+        if vals.keys() & {'area_manager_id', 'company_id', 'date_from', 'date_to'}:
+            self.action_recompute_consumption()
+        return res
+
+    @api.depends('amount', 'committed_amount', 'approved_amount', 'paid_amount')
+    def _compute_available_amount(self):
+        for budget in self:
+            budget.available_amount = budget.amount - budget.committed_amount - budget.approved_amount - budget.paid_amount
+
+    @api.constrains('area_manager_id', 'company_id', 'date_from', 'date_to')
+    def _check_overlap(self):
+        for budget in self:
+            if self.search_count([
+                ('id', '!=', budget.id),
+                ('area_manager_id', '=', budget.area_manager_id.id),
+                ('company_id', '=', budget.company_id.id),
+                ('date_from', '<=', budget.date_to),
+                ('date_to', '>=', budget.date_from),
+            ], limit=1):
+                raise ValidationError(_("The area manager %s already has a budget for this period.", budget.area_manager_id.name))
+
+    @api.model
+    def _get_budgets_by_area(self, area_managers, companies):
+        """ :return: a dict {(area_manager_id, company_id): budgets} of the budgets of the given areas """
+        budgets_by_area = {}
+        for budget in self.sudo().search([('area_manager_id', 'in', area_managers.ids), ('company_id', 'in', companies.ids)]):
+            budgets_by_area.setdefault((budget.area_manager_id.id, budget.company_id.id), []).append(budget)
+        return budgets_by_area
+
+    def _apply_counter_deltas(self, deltas):
+        """
+        Add the deltas to the counters with one atomic UPDATE: the rows stay locked until the end of the transaction,
+        so concurrent submissions on the same budget are serialized.
+        :param deltas: a dict {budget_id: {'committed': amount, 'approved': amount, 'paid': amount}}
+        :return: a dict {budget_id: available amount} of the updated budgets
+        """
+        if not deltas:
+            return {}
+        budget_ids = list(deltas)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE account_area_budget budget
+               SET committed_amount = COALESCE(budget.committed_amount, 0) + delta.committed,
+                   approved_amount = COALESCE(budget.approved_amount, 0) + delta.approved,
+                   paid_amount = COALESCE(budget.paid_amount, 0) + delta.paid
+              FROM unnest(%s::int[], %s::numeric[], %s::numeric[], %s::numeric[]) AS delta(budget_id, committed, approved, paid)
+             WHERE budget.id = delta.budget_id
+         RETURNING budget.id, COALESCE(budget.amount, 0) - budget.committed_amount - budget.approved_amount - budget.paid_amount
+            """,
+            budget_ids,
+            [deltas[budget_id].get('committed', 0.0) for budget_id in budget_ids],
+            [deltas[budget_id].get('approved', 0.0) for budget_id in budget_ids],
+            [deltas[budget_id].get('paid', 0.0) for budget_id in budget_ids],
+        ))
+        available_amounts = dict(self.env.cr.fetchall())
+        self.invalidate_model(['committed_amount', 'approved_amount', 'paid_amount', 'available_amount'])
+        return available_amounts
+
+    def _check_consumption(self, available_amounts):
+        """
+        Raise if one of the budgets is exceeded
+        :param available_amounts: a dict {budget_id: available amount}, as returned by `_apply_counter_deltas`
+        """
+        exceeded = self.sudo().filtered(
+            lambda budget: budget.currency_id.compare_amounts(available_amounts[budget.id], 0.0) < 0
+        )
+        if exceeded:
+            raise UserError(_(
+                "The following area budgets would be exceeded:\n%s",
+                "\n".join(
+                    _("%(budget)s: %(available)s available", budget=budget.name, available=available_amounts[budget.id])
+                    for budget in exceeded
+                ),
+            ))
+
+    def action_recompute_consumption(self):
+        """
+        Rebuild the counters of the budgets from the expenses of their area and period. The expenses counted before in
+        the budgets are counted again too, in the budget now covering them if any.
+        """
+        if not self:
+            return
+        self.env['account.area.expense'].flush_model()
+        self.flush_recordset()
+        self.env.cr.execute(SQL(
+            """
+            UPDATE account_area_budget
+               SET committed_amount = 0, approved_amount = 0, paid_amount = 0
+             WHERE id = ANY(%(budget_ids)s);
+            UPDATE account_area_expense
+               SET area_budget_id = NULL, area_budget_stage = NULL, area_budget_amount = 0
+             WHERE area_budget_id = ANY(%(budget_ids)s)
+         RETURNING id
+            """,
+            budget_ids=self.ids,
+        ))
+        previous_expense_ids = [expense_id for expense_id, in self.env.cr.fetchall()]
+        self.env['account.area.expense'].invalidate_model(['area_budget_id', 'area_budget_stage', 'area_budget_amount'])
+        self.invalidate_recordset(['committed_amount', 'approved_amount', 'paid_amount', 'available_amount'])
+
+        domain = expression.OR([[
+            ('area_manager_id', '=', budget.area_manager_id.id),
+            ('company_id', '=', budget.company_id.id),
+            ('date', '>=', budget.date_from),
+            ('date', '<=', budget.date_to),
+        ] for budget in self])
+        expenses = self.env['account.area.expense'].sudo().search(domain)
+        (expenses | expenses.browse(previous_expense_ids))._update_area_budget_counters()
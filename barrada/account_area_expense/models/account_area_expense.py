@@ -1,6 +1,9 @@
 from odoo import api, fields, Command, models, _
 from odoo.exceptions import UserError, ValidationError
-from odoo.tools import email_split, float_repr, float_round, is_html_empty
+from odoo.tools import SQL, email_split, float_repr, float_round, is_html_empty
+from odoo.tools.sql import create_index
+
+from .account_area_expense_stat import instrumented
 
 
 class AccountAreaExpense(models.Model):
@@ -32,7 +35,7 @@ class AccountAreaExpense(models.Model):
         string='Taxes'
     )
 
-    account_sheet_id = fields.Many2one('account.area.expense.sheet', 'Sheet Report')
+    account_sheet_id = fields.Many2one('account.area.expense.sheet', 'Sheet Report', index='btree_not_null')
 
     sale_order_id = fields.Many2one('sale.order', compute='_compute_sale_order_id', store=True, index='btree_not_null',
                                     string='Customer to Reinvoice', readonly=False, tracking=True,
@@ -63,9 +66,96 @@ class AccountAreaExpense(models.Model):
         default='draft',
     )
 
+    # Last contribution of the expense to the counters of account.area.budget, only written by _update_area_budget_counters
+    area_budget_id = fields.Many2one('account.area.budget', "Area Budget", readonly=True, copy=False, index='btree_not_null')
+    area_budget_stage = fields.Selection(
+        selection=[('committed', 'Committed'), ('approved', 'Approved'), ('paid', 'Paid')],
+        string="Budget Stage", readonly=True, copy=False,
+    )
+    area_budget_amount = fields.Monetary("Budget Amount", currency_field='company_currency_id', readonly=True, copy=False)
+    # Marks the expenses whose contribution must be updated, done before the transaction commits
+    area_budget_dirty = fields.Boolean(compute='_compute_area_budget_dirty', store=True, copy=False)
+
+    duplicate_fingerprint = fields.Char(
+        string="Duplicate Fingerprint",
+        compute='_compute_duplicate_fingerprint', store=True, index='btree_not_null',
+        copy=False, readonly=True,
+        help="Company, vendor, amount, date and receipt of the expense. Expenses sharing it are considered duplicates.",
+    )
+
+    duplicate_expense_ids = fields.Many2many('account.area.expense', compute='_compute_duplicate_expense_ids')
+
+    def init(self):
+        super().init()
+        create_index(self.env.cr, 'account_area_expense_area_budget_dirty_idx', self._table, ['id'], where='area_budget_dirty')
+
+    @api.depends('company_id', 'vendor_id', 'currency_id', 'total_amount_currency', 'date', 'message_main_attachment_id.checksum')
+    def _compute_duplicate_fingerprint(self):
+        for expense in self:
+            if not (expense.vendor_id and expense.date and expense.total_amount_currency):
+                expense.duplicate_fingerprint = False
+                continue
+            currency = expense.currency_id
+            expense.duplicate_fingerprint = '|'.join((
+                str(expense.company_id.id),
+                str(expense.vendor_id.id),
+                currency.name,
+                float_repr(currency.round(expense.total_amount_currency), currency.decimal_places),
+                fields.Date.to_string(expense.date),
+                expense.message_main_attachment_id.checksum or '',
+            ))
+
+    @api.depends('duplicate_fingerprint')
+    def _compute_duplicate_expense_ids(self):
+        self.duplicate_expense_ids = [Command.clear()]
+        fingerprints = set(self.filtered('duplicate_fingerprint').mapped('duplicate_fingerprint'))
+        if not fingerprints:
+            return
+        duplicates = self.sudo()._read_group(
+            [('duplicate_fingerprint', 'in', list(fingerprints))],
+            ['duplicate_fingerprint'],
+            ['id:array_agg'],
+            having=[('__count', '>', 1)],
+        )
+        expense_ids_by_fingerprint = dict(duplicates)
+        for expense in self:
+            expense_ids = expense_ids_by_fingerprint.get(expense.duplicate_fingerprint)
+            if expense_ids:
+                expense.duplicate_expense_ids = [Command.set([expense_id for expense_id in expense_ids if expense_id != expense._origin.id])]
+
+    @api.model
+    def _get_duplicate_groups(self, date_from, date_to):
+        """
+        :return: the ids of every group of expenses sharing the same fingerprint between `date_from` and `date_to`,
+                 fetched with one grouped query on the fingerprint index
+        """
+        return [expense_ids for _fingerprint, expense_ids in self._read_group(
+            [('duplicate_fingerprint', '!=', False), ('date', '>=', date_from), ('date', '<=', date_to)],
+            ['duplicate_fingerprint'],
+            ['id:array_agg'],
+            having=[('__count', '>', 1)],
+        )]
+
+    def action_find_period_duplicates(self):
+        """ List every duplicated expense in the period covered by the selected expenses """
+        dates = self.filtered('date').mapped('date')
+        if not dates:
+            raise UserError(_("Select expenses with a date to define the period to check."))
+        duplicate_ids = [expense_id for expense_ids in self._get_duplicate_groups(min(dates), max(dates)) for expense_id in expense_ids]
+        return {
+            'name': _('Duplicated Expenses'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.area.expense',
+            'views': [[False, "list"], [False, "form"]],
+            'domain': [('id', 'in', duplicate_ids)],
+            'context': {'group_by': ['duplicate_fingerprint']},
+        }
+
+    @instrumented('action_submit_expenses')
     def action_submit_expenses(self):
         self.payment_mode = 'own_account'
         sheets = self._create_sheets_from_expense()
+        self._check_area_budget()
         return {
             'name': _('New Expense Reports'),
             'type': 'ir.actions.act_window',
@@ -77,14 +167,14 @@ class AccountAreaExpense(models.Model):
         }
 
     def _create_sheets_from_expense(self):
-        if self.payment_account_mode == 'manager_area':
-            if self.filtered(lambda expense: not expense.is_editable):
-                raise UserError(_('You are not authorized to edit this expense.'))
-            sheets = self.env['account.area.expense.sheet'].create(self._get_default_expense_sheet_values())
-            return sheets
+        if self.filtered(lambda expense: expense.payment_account_mode == 'manager_area' and not expense.is_editable):
+            raise UserError(_('You are not authorized to edit this expense.'))
+        return self.env['account.area.expense.sheet'].create(self._get_default_expense_sheet_values())
 
-        sheets = self.env['account.area.expense.sheet'].create(self._get_default_expense_sheet_values())
-        return sheets
+    def _get_expense_sheet_grouping_key(self):
+        """ Expenses sharing the same key are reported in the same sheet """
+        self.ensure_one()
+        return self.company_id, self.payment_mode, self.payment_account_mode, self.area_manager_id, self.vendor_id
 
     def _get_default_expense_sheet_values(self):
         # If there is an expense with total_amount == 0, it means that expense has not been processed by OCR yet
@@ -100,15 +190,9 @@ class AccountAreaExpense(models.Model):
             raise UserError(_("You cannot report the expenses without amount!"))
         if any(not expense.product_id for expense in expenses_with_amount):
             raise UserError(_("You can not create report without category."))
-        if len(self.company_id) != 1:
-            raise UserError(_("You cannot report expenses for different companies in the same report."))
 
-        # Check if two reports should be created
-        own_expenses = expenses_with_amount.filtered(lambda x: x.payment_mode == 'own_account')
-        company_expenses = expenses_with_amount - own_expenses
-        create_two_reports = own_expenses and company_expenses
-
-        sheets = (own_expenses, company_expenses) if create_two_reports else (expenses_with_amount,)
+        # One report per company, payment mode, area payment mode, area manager and vendor
+        sheets = list(expenses_with_amount.grouped(lambda expense: expense._get_expense_sheet_grouping_key()).values())
         values = []
 
         # We use a fallback name only when several expense sheets are created,
@@ -119,9 +203,11 @@ class AccountAreaExpense(models.Model):
             if not sheet_name and len(sheets) > 1:
                 sheet_name = _("New Expense Report, paid by %(paid_by)s", paid_by=paid_by)
             values.append({
-                'company_id': self.company_id.id,
-                'employee_id': self[0].employee_id.id,
+                'company_id': todo[0].company_id.id,
+                'employee_id': todo[0].employee_id.id,
                 'name': sheet_name,
+                'provider_id': todo[0].vendor_id.id,
+                'area_manager_id': todo[0].area_manager_id.id,
                 'account_expense_line_ids': [Command.set(todo.ids)],
                 'state': 'draft',
             })
@@ -170,27 +256,176 @@ class AccountAreaExpense(models.Model):
             else:
                 expense.state = 'done'
 
+    def _get_area_budget_stage(self):
+        """ Counter of account.area.budget the expense belongs to, according to its state """
+        self.ensure_one()
+        return {
+            'reported': 'committed',
+            'submitted': 'committed',
+            'approved': 'approved',
+            'done': 'paid',
+        }.get(self.state, False)
+
+    @api.depends('state', 'total_amount', 'area_manager_id', 'company_id', 'date')
+    def _compute_area_budget_dirty(self):
+        self.area_budget_dirty = True
+        precommit = self.env.cr.precommit
+        if not precommit.data.get('account_area_budget_update'):
+            precommit.data['account_area_budget_update'] = True
+            precommit.add(self.env['account.area.expense'].sudo()._update_dirty_area_budget_counters)
+
+    @api.model
+    def _update_dirty_area_budget_counters(self):
+        """
+        Apply the contribution changes of the expenses flagged with `area_budget_dirty`, then clear the flag
+        :return: see `_update_area_budget_counters`
+        """
+        self.env.flush_all()
+        self.env.cr.execute(SQL("SELECT id FROM account_area_expense WHERE area_budget_dirty"))
+        expense_ids = [expense_id for expense_id, in self.env.cr.fetchall()]
+        if not expense_ids:
+            return [], {}
+        result = self.browse(expense_ids)._update_area_budget_counters()
+        self.env.cr.execute(SQL(
+            "UPDATE account_area_expense SET area_budget_dirty = FALSE WHERE id = ANY(%s)",
+            expense_ids,
+        ))
+        self.invalidate_model(['area_budget_dirty'])
+        return result
+
+    def _update_area_budget_counters(self, release=False):
+        """
+        Move the amount of the expenses between the counters of their area budget, from the stage recorded at the last
+        update to the one matching their current state. Only the differences are applied, so the counters never need to
+        sum the expenses again.
+        :param release: remove the expenses from the counters, e.g. when they are deleted
+        :return: a tuple (contributions, available amounts): the list of (expense_id, budget_id, amount) added to the
+                 consumption of the budgets, negative when an expense leaves a budget, and a dict {budget_id: available
+                 amount} of the updated budgets, read from their locked rows
+        """
+        expenses = self.filtered(lambda expense: isinstance(expense.id, int))
+        if not expenses:
+            return [], {}
+
+        self.env.cr.execute(SQL(
+            "SELECT id, area_budget_id, area_budget_stage, area_budget_amount FROM account_area_expense WHERE id = ANY(%s)",
+            expenses.ids,
+        ))
+        previous = {expense_id: (budget_id, stage, amount or 0.0) for expense_id, budget_id, stage, amount in self.env.cr.fetchall()}
+        budgets_by_area = self.env['account.area.budget']._get_budgets_by_area(expenses.area_manager_id, expenses.company_id)
+
+        deltas = {}
+        contributions = []
+        snapshots = []
+        for expense in expenses:
+            budget_id, stage, amount = False, False, 0.0
+            if not release and expense.area_manager_id and expense.date:
+                stage = expense._get_area_budget_stage()
+                budget = next((
+                    budget for budget in budgets_by_area.get((expense.area_manager_id.id, expense.company_id.id), [])
+                    if budget.date_from <= expense.date <= budget.date_to
+                ), None)
+                if stage and budget:
+                    budget_id, amount = budget.id, expense.total_amount
+                else:
+                    stage = False
+
+            old_budget_id, old_stage, old_amount = previous.get(expense.id, (None, None, 0.0))
+            if (old_budget_id or False, old_stage or False, old_amount) == (budget_id, stage, amount):
+                continue
+            if old_budget_id and old_stage:
+                old_delta = deltas.setdefault(old_budget_id, {})
+                old_delta[old_stage] = old_delta.get(old_stage, 0.0) - old_amount
+                contributions.append((expense.id, old_budget_id, -old_amount))
+            if budget_id:
+                new_delta = deltas.setdefault(budget_id, {})
+                new_delta[stage] = new_delta.get(stage, 0.0) + amount
+                contributions.append((expense.id, budget_id, amount))
+            snapshots.append((expense.id, budget_id or None, stage or None, amount))
+
+        if not snapshots:
+            return [], {}
+        available_amounts = self.env['account.area.budget']._apply_counter_deltas(deltas)
+        expense_ids, budget_ids, stages, amounts = zip(*snapshots)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE account_area_expense expense
+               SET area_budget_id = snapshot.budget_id,
+                   area_budget_stage = snapshot.stage,
+                   area_budget_amount = snapshot.amount
+              FROM unnest(%s::int[], %s::int[], %s::varchar[], %s::numeric[]) AS snapshot(expense_id, budget_id, stage, amount)
+             WHERE expense.id = snapshot.expense_id
+            """,
+            list(expense_ids), list(budget_ids), list(stages), list(amounts),
+        ))
+        expenses.invalidate_recordset(['area_budget_id', 'area_budget_stage', 'area_budget_amount'])
+        return contributions, available_amounts
+
+    def _check_area_budget(self):
+        """
+        Count the pending state transitions in the budgets, then raise for the budgets that the transitions of these
+        expenses add to and leave below zero. Transitions adding nothing, e.g. from committed to approved, never block,
+        even on a budget that is already exceeded.
+        """
+        contributions, available_amounts = self.env['account.area.expense'].sudo()._update_dirty_area_budget_counters()
+        expense_ids = set(self.ids)
+        added_amounts = {}
+        for expense_id, budget_id, amount in contributions:
+            if expense_id in expense_ids:
+                added_amounts[budget_id] = added_amounts.get(budget_id, 0.0) + amount
+        budgets = self.env['account.area.budget'].sudo().browse(added_amounts).filtered(
+            lambda budget: budget.currency_id.compare_amounts(added_amounts[budget.id], 0.0) > 0
+        )
+        budgets._check_consumption(available_amounts)
+
+    def unlink(self):
+        self._update_area_budget_counters(release=True)
+        return super().unlink()
+
     def _prepare_payments_vals(self):
         self.ensure_one()
+        return self._prepare_payments_vals_batch()[0]
 
-        journal = self.account_sheet_id.journal_id
-        payment_method_line = self.account_sheet_id.payment_method_line_id
-        if not payment_method_line:
-            raise UserError(_("You need to add a manual payment method on the journal (%s)", journal.name))
+    def _prepare_payments_vals_batch(self):
+        """
+        Prepare the move and payment values of several expenses at once. The tax details of all the base lines are
+        computed with one call to the tax engine per company; the rounding and the tax lines stay per expense as each
+        expense gets its own move.
+        :return: a list of (move_vals, payment_vals) tuples, in the same order as the expenses
+        """
+        for expense in self:
+            if not expense.account_sheet_id.payment_method_line_id:
+                raise UserError(_("You need to add a manual payment method on the journal (%s)", expense.account_sheet_id.journal_id.name))
 
         AccountTax = self.env['account.tax']
-        rate = abs(self.total_amount_currency / self.total_amount) if self.total_amount else 0.0
-        base_line = self._prepare_base_line_for_taxes_computation(
-            price_unit=self.total_amount_currency,
-            quantity=1.0,
-            account_id=self._get_base_account(),
-            rate=rate,
-        )
-        base_lines = [base_line]
-        AccountTax._add_tax_details_in_base_lines(base_lines, self.company_id)
-        AccountTax._round_base_lines_tax_details(base_lines, self.company_id)
-        AccountTax._add_accounting_data_in_base_lines_tax_details(base_lines, self.company_id, include_caba_tags=self.payment_mode == 'company_account')
-        tax_results = AccountTax._prepare_tax_lines(base_lines, self.company_id)
+        base_line_per_expense = {}
+        for expense in self:
+            rate = abs(expense.total_amount_currency / expense.total_amount) if expense.total_amount else 0.0
+            base_line_per_expense[expense] = expense._prepare_base_line_for_taxes_computation(
+                price_unit=expense.total_amount_currency,
+                quantity=1.0,
+                account_id=expense._get_base_account(),
+                rate=rate,
+            )
+
+        for company, expenses in self.grouped('company_id').items():
+            AccountTax._add_tax_details_in_base_lines([base_line_per_expense[expense] for expense in expenses], company)
+        for expense in self:
+            AccountTax._round_base_lines_tax_details([base_line_per_expense[expense]], expense.company_id)
+        for (company, include_caba_tags), expenses in self.grouped(lambda expense: (expense.company_id, expense.payment_mode == 'company_account')).items():
+            AccountTax._add_accounting_data_in_base_lines_tax_details(
+                [base_line_per_expense[expense] for expense in expenses], company, include_caba_tags=include_caba_tags)
+
+        return [
+            expense._prepare_payments_vals_from_tax_results(
+                AccountTax._prepare_tax_lines([base_line_per_expense[expense]], expense.company_id))
+            for expense in self
+        ]
+
+    def _prepare_payments_vals_from_tax_results(self, tax_results):
+        self.ensure_one()
+        journal = self.account_sheet_id.journal_id
+        payment_method_line = self.account_sheet_id.payment_method_line_id
 
         # Base line.
         move_lines = []
@@ -247,8 +482,9 @@ class AccountAreaExpense(models.Model):
             'currency_id': self.currency_id.id,
             'line_ids': [Command.create(line) for line in move_lines],
             'attachment_ids': [
-                Command.create(attachment.copy_data({'res_model': 'account.move', 'res_id': False, 'raw': attachment.raw})[0])
-                for attachment in self.message_main_attachment_id]
+                Command.link(attachment.id)
+                for attachment in self.message_main_attachment_id.sudo()._copy_with_shared_blob({'res_model': 'account.move', 'res_id': False})
+            ],
         }
         return move_vals, payment_vals
 
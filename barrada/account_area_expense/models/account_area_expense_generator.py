@@ -0,0 +1,198 @@
+import datetime
+import logging
+import random
+
+from odoo import api, fields, models, Command
+from odoo.tools.misc import split_every
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountAreaExpenseGenerator(models.AbstractModel):
+    """
+    Synthetic data for load-testing the area expenses, meant to be run from odoo-bin shell on a disposable database:
+
+        env['account.area.expense.generator'].generate(seed=42, expenses=200000)
+        env.cr.commit()
+
+    The records are created with batched ORM `create`s so that the stored computed fields and the report and budget
+    bookkeeping stay consistent. The same seed and volumes always produce the same dataset, and the records already
+    generated are found by their tagged name, login or reference and not created again, so that a run interrupted
+    after an `auto_commit` can be resumed by calling `generate` again.
+    """
+    _name = "account.area.expense.generator"
+    _description = "Area Expense Data Generator"
+
+    @api.model
+    def _get_default_volumes(self):
+        return {
+            'employees': 2000,
+            'area_managers': 50,
+            'vendors': 1000,
+            'products': 200,
+            'expenses': 100000,
+            'expenses_per_sheet': 10,
+            'attachment_ratio': 0.5,
+            'report_ratio': 0.5,
+            'days': 365,
+        }
+
+    @api.model
+    def generate(self, seed=0, batch_size=2000, auto_commit=False, **volumes):
+        """
+        Generate a dataset in the current company.
+        :param seed: seed of the random generator
+        :param batch_size: number of records created at once
+        :param auto_commit: commit after each batch, so that an interrupted run can be resumed
+        :param volumes: overrides of `_get_default_volumes`
+        :return: a dict {entity: recordset} of the generated records
+        """
+        unknown = volumes.keys() - self._get_default_volumes().keys()
+        if unknown:
+            raise ValueError("Unknown volumes: %s" % ", ".join(sorted(unknown)))
+        volumes = {**self._get_default_volumes(), **volumes}
+        if volumes['products'] < 1 or volumes['vendors'] < 1 or volumes['employees'] < 1:
+            raise ValueError("At least one product, vendor and employee are needed to generate expenses")
+        generator = self.with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True, no_reset_password=True,
+            generator_batch_size=batch_size, generator_auto_commit=auto_commit,
+        )
+        rng = random.Random(seed)
+        tag = 'GEN%s' % seed
+        data = {}
+        data['area_managers'] = generator._generate_area_managers(rng, tag, volumes['area_managers'])
+        data['employees'] = generator._generate_employees(rng, tag, volumes['employees'])
+        data['vendors'] = generator._generate_vendors(rng, tag, volumes['vendors'])
+        data['products'] = generator._generate_products(rng, tag, volumes['products'])
+        data['expenses'] = generator._generate_expenses(rng, tag, data, volumes)
+        data['sheets'] = generator._generate_sheets(rng, data['expenses'], volumes)
+        _logger.info("Generated dataset %s: %s", tag, {key: len(records) for key, records in data.items()})
+        return data
+
+    def _create_in_batches(self, model, key_field, vals_list):
+        """
+        Create the records in batches, flushing and emptying the cache between batches. The records whose `key_field`
+        value already exists, generated by a previous run, are kept instead of being created again.
+        :return: the existing and created records, in the order of `vals_list`
+        """
+        Model = self.env[model].with_context(active_test=False)
+        records_ids = []
+        batch_size = self.env.context.get('generator_batch_size') or 2000
+        for batch in split_every(batch_size, vals_list):
+            existing_ids = {
+                record[key_field]: record.id
+                for record in Model.search_fetch([(key_field, 'in', [vals[key_field] for vals in batch])], [key_field])
+            }
+            created_ids = iter(Model.create([vals for vals in batch if vals[key_field] not in existing_ids]).ids)
+            records_ids.extend(existing_ids.get(vals[key_field]) or next(created_ids) for vals in batch)
+            self._commit_batch()
+            _logger.info("Generated %s %s records", len(records_ids), model)
+        return self.env[model].browse(records_ids)
+
+    def _commit_batch(self):
+        """ End a batch: flush, empty the cache and commit when `auto_commit` is set """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        if self.env.context.get('generator_auto_commit'):
+            self.env.cr.commit()
+
+    def _generate_area_managers(self, rng, tag, count):
+        group = self.env.ref('account_area_expense.group_area_manager')
+        return self._create_in_batches('res.users', 'login', ({
+            'name': '%s Area Manager %s' % (tag, index),
+            'login': '%s-area-manager-%s' % (tag.lower(), index),
+            'company_id': self.env.company.id,
+            'company_ids': [Command.set(self.env.company.ids)],
+            'groups_id': [Command.link(group.id)],
+        } for index in range(count)))
+
+    def _generate_employees(self, rng, tag, count):
+        return self._create_in_batches('hr.employee', 'name', ({
+            'name': '%s Employee %s' % (tag, index),
+            'company_id': self.env.company.id,
+        } for index in range(count)))
+
+    def _generate_vendors(self, rng, tag, count):
+        return self._create_in_batches('res.partner', 'ref', ({
+            'name': '%s Vendor %s' % (tag, index),
+            'is_company': True,
+            'ref': '%s-V%s' % (tag, index),
+            'company_id': False,
+        } for index in range(count)))
+
+    def _generate_products(self, rng, tag, count):
+        taxes = self.env['account.tax'].search([
+            *self.env['account.tax']._check_company_domain(self.env.company),
+            ('type_tax_use', '=', 'purchase'),
+        ], order='id')
+        return self._create_in_batches('product.product', 'default_code', ({
+            'name': '%s Expense %s' % (tag, index),
+            'default_code': '%s-EXP-%s' % (tag, index),
+            'type': 'service',
+            'can_be_expensed': True,
+            'standard_price': 0.0,
+            'supplier_taxes_id': [Command.set(taxes[rng.randrange(len(taxes))].ids if taxes else [])],
+        } for index in range(count)))
+
+    def _generate_expenses(self, rng, tag, data, volumes):
+        today = fields.Date.context_today(self)
+        products = data['products']
+        vendors = data['vendors']
+        area_managers = data['area_managers']
+        employees = data['employees']
+        product_taxes = {product.id: product.supplier_taxes_id.ids for product in products}
+
+        def expense_vals():
+            for index in range(volumes['expenses']):
+                product = products[rng.randrange(len(products))]
+                paid_by_company = rng.random() < 0.3
+                yield {
+                    'name': '%s Expense line %s' % (tag, index),
+                    'date': today - datetime.timedelta(days=rng.randrange(max(volumes['days'], 1))),
+                    'product_id': product.id,
+                    'total_amount_currency': round(rng.uniform(5.0, 2000.0), 2),
+                    'tax_ids': [Command.set(product_taxes[product.id])],
+                    'employee_id': employees[rng.randrange(len(employees))].id,
+                    'area_manager_id': area_managers[rng.randrange(len(area_managers))].id if area_managers else False,
+                    'payment_account_mode': 'company' if paid_by_company else 'manager_area',
+                    'vendor_id': vendors[rng.randrange(len(vendors))].id if paid_by_company or rng.random() < 0.5 else False,
+                    'company_id': self.env.company.id,
+                }
+
+        expenses = self._create_in_batches('account.area.expense', 'name', expense_vals())
+
+        with_attachment = [expense_id for expense_id in expenses.ids if rng.random() < volumes['attachment_ratio']]
+        self._create_in_batches('ir.attachment', 'name', ({
+            'name': '%s-receipt-%s.pdf' % (tag, expense_id),
+            'raw': b'%%PDF-1.4\n%% %s receipt %s\n%%%%EOF\n' % (tag.encode(), str(expense_id).encode()),
+            'mimetype': 'application/pdf',
+            'res_model': 'account.area.expense',
+            'res_id': expense_id,
+        } for expense_id in with_attachment))
+        return expenses
+
+    def _generate_sheets(self, rng, expenses, volumes):
+        """
+        Report a share of the expenses, grouped in sheets as when they are submitted from the list: the expenses are
+        sorted on the sheet grouping key and reported by slices of `expenses_per_sheet`.
+        """
+        reported = expenses.browse([expense_id for expense_id in expenses.ids if rng.random() < volumes['report_ratio']])
+        reported.fetch(['company_id', 'payment_account_mode', 'area_manager_id', 'vendor_id', 'account_sheet_id'])
+        # Expenses reported by a previous run
+        existing_sheet_ids = reported.account_sheet_id.ids
+        reported_ids = [expense.id for expense in reported.filtered(lambda expense: not expense.account_sheet_id).sorted(lambda expense: (
+            expense.payment_account_mode, expense.area_manager_id.id, expense.vendor_id.id, expense.id,
+        ))]
+        self.env.invalidate_all()
+
+        per_sheet = max(volumes['expenses_per_sheet'], 1)
+        sheet_ids = []
+        batch_size = self.env.context.get('generator_batch_size') or 2000
+        for batch_ids in split_every(max(batch_size // per_sheet, 1) * per_sheet, reported_ids):
+            sheet_vals = []
+            for todo_ids in split_every(per_sheet, batch_ids):
+                sheet_vals.extend(self.env['account.area.expense'].browse(todo_ids)._get_default_expense_sheet_values())
+            sheet_ids.extend(self.env['account.area.expense.sheet'].create(sheet_vals).ids)
+            self._commit_batch()
+            _logger.info("Generated %s account.area.expense.sheet records", len(sheet_ids))
+        return self.env['account.area.expense.sheet'].browse(existing_sheet_ids + sheet_ids)
@@ -0,0 +1,243 @@
+import logging
+import threading
+import time
+import uuid
+
+from datetime import timedelta
+
+from psycopg2 import errors as pg_errors
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.misc import split_every
+
+_logger = logging.getLogger(__name__)
+
+# Errors of concurrent transactions: the job is tried again later instead of failing
+RETRYABLE_ERRORS = (pg_errors.SerializationFailure, pg_errors.DeadlockDetected, pg_errors.LockNotAvailable)
+
+# Crons processing the queue, each of them picks the next job that is not locked by the others
+WORKER_CRONS = (
+    'account_area_expense.ir_cron_expense_job_worker_1',
+    'account_area_expense.ir_cron_expense_job_worker_2',
+    'account_area_expense.ir_cron_expense_job_worker_3',
+)
+
+
+class AccountAreaExpenseJob(models.Model):
+    """
+    Chunk of a long expense operation run in background by the `ir.cron` workers of `WORKER_CRONS`.
+    The workers claim the pending jobs with `FOR UPDATE SKIP LOCKED`, so they process different chunks in parallel,
+    and run each job as the user who enqueued it in its own transaction.
+    """
+    _name = "account.area.expense.job"
+    _description = "Expense Background Job"
+    _order = "priority, id"
+
+    name = fields.Char("Operation", required=True, readonly=True)
+    batch_uuid = fields.Char("Batch", required=True, readonly=True, index=True,
+                             help="Jobs enqueued together for the same operation")
+    res_model = fields.Char("Model", required=True, readonly=True)
+    res_ids = fields.Json("Records", readonly=True)
+    record_count = fields.Integer("# Records", readonly=True)
+    method = fields.Char("Method", required=True, readonly=True)
+    args = fields.Json("Arguments", readonly=True)
+    priority = fields.Integer("Priority", default=10, readonly=True)
+    state = fields.Selection(
+        selection=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')],
+        string="Status", default='pending', required=True, readonly=True, index=True,
+    )
+    attempt_count = fields.Integer("Attempts", readonly=True)
+    max_attempts = fields.Integer("Max Attempts", default=5, readonly=True)
+    date_next_try = fields.Datetime("Next Try", readonly=True)
+    date_done = fields.Datetime("Done On", readonly=True)
+    error = fields.Text("Error", readonly=True)
+    user_id = fields.Many2one('res.users', "User", required=True, readonly=True, default=lambda self: self.env.user)
+    company_id = fields.Many2one('res.company', "Company", required=True, readonly=True, default=lambda self: self.env.company)
+    allowed_company_ids = fields.Json("Allowed Companies", readonly=True)
+    batch_progress = fields.Float("Progress", compute='_compute_batch_progress',
+                                  help="Percentage of the jobs of the batch that are processed")
+
+    def _compute_batch_progress(self):
+        batches = self._read_group(
+            [('batch_uuid', 'in', self.mapped('batch_uuid'))],
+            ['batch_uuid', 'state'],
+            ['__count'],
+        )
+        counts = {}
+        for batch_uuid, state, count in batches:
+            total, processed = counts.get(batch_uuid, (0, 0))
+            counts[batch_uuid] = (total + count, processed + (count if state != 'pending' else 0))
+        for job in self:
+            total, processed = counts.get(job.batch_uuid, (0, 0))
+            job.batch_progress = 100.0 * processed / total if total else 0.0
+
+    @api.model
+    def _get_allowed_methods(self):
+        """
+        :return: a dict mapping each (model, method) that can be run in background to the domain of the records it
+            expects: when the job runs, the records of its chunk that no longer match it are skipped
+        """
+        return {
+            ('account.area.expense.sheet', '_bulk_post_chunk'): [('state', '=', 'approve')],
+            ('account.area.expense.sheet', 'action_reset_expense_sheets'): [('state', '!=', 'draft')],
+            ('account.area.expense.sheet', '_do_refuse'): [('state', 'not in', ('draft', 'cancel'))],
+        }
+
+    # -------------------------------------------------------------------------
+    # ENQUEUING
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _enqueue(self, records, method, args=None, name=None, chunk_size=None):
+        """
+        Split `records` in chunks and enqueue one job per chunk calling `records.method(*args)`.
+        The chunk size is read from the `account_area_expense.job_chunk_size` system parameter when not given.
+        The records having a `background_job_id` field are linked to their job to show its progress.
+        :return: the created jobs
+        """
+        if (records._name, method) not in self._get_allowed_methods():
+            raise UserError(_("The operation %(method)s of %(model)s cannot be run in background.", method=method, model=records._name))
+        if not records:
+            return self.browse()
+        chunk_size = chunk_size or int(self.env['ir.config_parameter'].sudo().get_param('account_area_expense.job_chunk_size', 50))
+        batch_uuid = str(uuid.uuid4())
+        chunks = list(split_every(max(chunk_size, 1), records.ids))
+        jobs = self.sudo().create([{
+            'name': name or method,
+            'batch_uuid': batch_uuid,
+            'res_model': records._name,
+            'res_ids': list(chunk_ids),
+            'record_count': len(chunk_ids),
+            'method': method,
+            'args': list(args or []),
+            'allowed_company_ids': self.env.companies.ids,
+        } for chunk_ids in chunks])
+        if 'background_job_id' in records._fields:
+            for job, chunk_ids in zip(jobs, chunks):
+                records.browse(chunk_ids).sudo().background_job_id = job
+        self._trigger_workers()
+        return jobs
+
+    @api.model
+    def _trigger_workers(self):
+        for xmlid in WORKER_CRONS:
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
+    @api.model
+    def _get_enqueued_notification(self, jobs):
+        """ :return: the notification action telling the user that the operation runs in background """
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'info',
+                'title': _("Running in background"),
+                'message': _(
+                    "%(count)s records split in %(jobs)s jobs. Their progress is shown in the list.",
+                    count=sum(jobs.mapped('record_count')), jobs=len(jobs),
+                ),
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
+
+    # -------------------------------------------------------------------------
+    # PROCESSING
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _cron_process_jobs(self, time_limit=240):
+        """ Process pending jobs until none is left or `time_limit` seconds have passed """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        start = time.monotonic()
+        processed = 0
+        while time.monotonic() - start < time_limit:
+            job = self._acquire_job()
+            if not job:
+                break
+            job._run()
+            processed += 1
+            if auto_commit:
+                # Releases the lock of the job
+                self.env.cr.commit()
+        # Jobs waiting for their next try are not counted, not to trigger the worker again before they are due
+        remaining = self.search_count([
+            ('state', '=', 'pending'),
+            '|', ('date_next_try', '=', False), ('date_next_try', '<=', fields.Datetime.now()),
+        ])
+        self.env['ir.cron']._notify_progress(done=processed, remaining=remaining)
+
+    @api.model
+    def _acquire_job(self):
+        """ Lock the next pending job that no other worker is processing """
+        self.env.cr.execute(SQL(
+            """
+            SELECT id
+              FROM account_area_expense_job
+             WHERE state = 'pending'
+               AND (date_next_try IS NULL OR date_next_try <= NOW() AT TIME ZONE 'UTC')
+             ORDER BY priority, id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+            """
+        ))
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    def _run(self):
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint():
+                self._execute()
+        except RETRYABLE_ERRORS as error:
+            self._retry_later(error)
+        except Exception as error:
+            _logger.warning("Background job %s (%s) failed: %s", self.id, self.name, error)
+            self.write({'state': 'failed', 'error': str(error), 'attempt_count': self.attempt_count + 1})
+        else:
+            self.write({'state': 'done', 'date_done': fields.Datetime.now(), 'error': False, 'attempt_count': self.attempt_count + 1})
+
+    def _execute(self):
+        allowed_methods = self._get_allowed_methods()
+        if (self.res_model, self.method) not in allowed_methods:
+            raise UserError(_("The operation %(method)s of %(model)s cannot be run in background.", method=self.method, model=self.res_model))
+        records = self.env[self.res_model].with_user(self.user_id).with_context(
+            allowed_company_ids=self.allowed_company_ids or self.company_id.ids,
+            account_area_expense_job=True,
+            expense_deferred_tracking=True,
+        ).browse(self.res_ids or []).exists()
+        # The records may have been processed by hand since the job was enqueued
+        expected = records.filtered_domain(allowed_methods[self.res_model, self.method])
+        if records - expected:
+            _logger.info("Background job %s (%s) skipped the records no longer expected by %s: %s",
+                         self.id, self.name, self.method, (records - expected).ids)
+        records = expected
+        if records:
+            getattr(records, self.method)(*(self.args or []))
+
+    def _retry_later(self, error):
+        """ Try the job again with an exponential backoff, or fail it after `max_attempts` attempts """
+        attempt_count = self.attempt_count + 1
+        if attempt_count >= self.max_attempts:
+            self.write({'state': 'failed', 'error': str(error), 'attempt_count': attempt_count})
+            return
+        _logger.info("Background job %s conflicted with another transaction, retrying: %s", self.id, error)
+        self.write({
+            'attempt_count': attempt_count,
+            'date_next_try': fields.Datetime.now() + timedelta(seconds=10 * 2 ** attempt_count),
+            'error': str(error),
+        })
+
+    def action_retry(self):
+        self.filtered(lambda job: job.state == 'failed').write({
+            'state': 'pending', 'attempt_count': 0, 'date_next_try': False, 'error': False,
+        })
+        self._trigger_workers()
+
+    @api.autovacuum
+    def _gc_done_jobs(self):
+        """ Remove the jobs done for more than a week """
+        self.search([('state', '=', 'done'), ('date_done', '<', fields.Datetime.now() - timedelta(days=7))]).unlink()
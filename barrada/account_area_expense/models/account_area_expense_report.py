@@ -0,0 +1,154 @@
+from odoo import api, fields, models
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+# Month of a sheet in the report: its accounting date, or its creation date while it has none
+SHEET_MONTH_SQL = "date_trunc('month', COALESCE(sheet.accounting_date, sheet.create_date))::date"
+
+
+class AccountAreaExpenseReport(models.Model):
+    """
+    Area spend aggregated by company, month, sheet status, area manager, provider, product and analytic account.
+    The table is refreshed incrementally, one (company, month) bucket at a time: sheets whose figures change are flagged
+    with `report_dirty` and the buckets they leave or enter are rebuilt before the transaction commits.
+    The analytic dimension is the account of the project plan: each distribution key is counted once with the account
+    of that plan it contains, and the share of an expense left undistributed is reported as unallocated, so that the
+    totals match the sheets.
+    """
+    _name = "account.area.expense.report"
+    _description = "Area Expense Analysis"
+    _order = "date desc, company_id"
+    _rec_name = 'date'
+    _log_access = False
+
+    date = fields.Date("Month", readonly=True)
+    company_id = fields.Many2one('res.company', "Company", readonly=True)
+    state = fields.Selection(
+        selection=lambda self: self.env['account.area.expense.sheet']._fields['state'].selection,
+        string="Status",
+        readonly=True,
+    )
+    area_manager_id = fields.Many2one('res.users', "Area Manager", readonly=True)
+    provider_id = fields.Many2one('res.partner', "Provider", readonly=True)
+    product_id = fields.Many2one('product.product', "Category", readonly=True)
+    analytic_account_id = fields.Many2one('account.analytic.account', "Analytic Account", readonly=True)
+    unallocated = fields.Boolean("Unallocated", readonly=True, help="Share of the expenses not distributed on analytic accounts")
+    currency_id = fields.Many2one(related='company_id.currency_id', readonly=True)
+    total_amount = fields.Monetary("Total", currency_field='currency_id', readonly=True)
+    nb_expense = fields.Integer("# Expenses", readonly=True)
+
+    def init(self):
+        create_index(self.env.cr, 'account_area_expense_report_company_date_idx', self._table, ['company_id', 'date'])
+
+    @api.model
+    def _refresh_dirty_sheets(self):
+        """ Rebuild the buckets of the sheets flagged with `report_dirty`, then clear the flag """
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            """
+            SELECT company_id, report_bucket_date
+              FROM account_area_expense_sheet
+             WHERE report_dirty
+               AND report_bucket_date IS NOT NULL
+             UNION
+            SELECT sheet.company_id, %s
+              FROM account_area_expense_sheet sheet
+             WHERE sheet.report_dirty
+            """,
+            SQL(SHEET_MONTH_SQL),
+        ))
+        buckets = self.env.cr.fetchall()
+        if not buckets:
+            return
+
+        self._refresh_buckets(buckets)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE account_area_expense_sheet sheet
+               SET report_dirty = FALSE,
+                   report_bucket_date = %s
+             WHERE sheet.report_dirty
+            """,
+            SQL(SHEET_MONTH_SQL),
+        ))
+        self.env['account.area.expense.sheet'].invalidate_model(['report_dirty', 'report_bucket_date'])
+
+    @api.model
+    def _refresh_buckets(self, buckets):
+        """
+        Replace the rows of the given buckets by the aggregate of the live sheets and expenses.
+        :param buckets: an iterable of (company_id, month) tuples
+        """
+        buckets = set(buckets)
+        if not buckets:
+            return
+        company_ids, months = zip(*buckets)
+        self.env.flush_all()
+
+        self.env.cr.execute(SQL(
+            """
+            DELETE FROM account_area_expense_report report
+             USING unnest(%(company_ids)s::int[], %(months)s::date[]) AS bucket(company_id, date)
+             WHERE report.company_id = bucket.company_id
+               AND report.date = bucket.date
+            """,
+            company_ids=list(company_ids),
+            months=list(months),
+        ))
+        project_plan, _other_plans = self.env['account.analytic.plan']._get_all_plans()
+        self.env.cr.execute(SQL(
+            """
+            WITH expense_share AS (
+                SELECT bucket.date,
+                       sheet.company_id,
+                       sheet.state,
+                       sheet.area_manager_id,
+                       sheet.provider_id,
+                       expense.product_id,
+                       distribution.analytic_account_id,
+                       distribution.unallocated,
+                       expense.total_amount * distribution.percentage / 100.0 AS amount,
+                       -- An expense split on several rows is only counted on its first one
+                       ROW_NUMBER() OVER (
+                           PARTITION BY expense.id
+                           ORDER BY distribution.unallocated, distribution.analytic_account_id
+                       ) AS expense_row
+                  FROM account_area_expense_sheet sheet
+                  JOIN unnest(%(company_ids)s::int[], %(months)s::date[]) AS bucket(company_id, date)
+                    ON bucket.company_id = sheet.company_id
+                   AND bucket.date = %(sheet_month)s
+                  JOIN account_area_expense expense ON expense.account_sheet_id = sheet.id
+                  JOIN LATERAL (
+                        -- One row per distribution key, with the account of the project plan it contains
+                        SELECT analytic_account.id AS analytic_account_id,
+                               entry.value::numeric AS percentage,
+                               FALSE AS unallocated
+                          FROM jsonb_each_text(expense.analytic_distribution) AS entry
+                          LEFT JOIN account_analytic_account analytic_account
+                                 ON analytic_account.id = ANY(string_to_array(entry.key, ',')::int[])
+                                AND analytic_account.root_plan_id = %(plan_id)s
+                         UNION ALL
+                        -- Remainder of a partial or missing distribution
+                        SELECT NULL,
+                               100.0 - COALESCE(SUM(entry.value::numeric), 0.0),
+                               TRUE
+                          FROM jsonb_each_text(COALESCE(expense.analytic_distribution, '{}'::jsonb)) AS entry
+                        HAVING 100.0 - COALESCE(SUM(entry.value::numeric), 0.0) > 0.0
+                       ) AS distribution ON TRUE
+            )
+            INSERT INTO account_area_expense_report (
+                date, company_id, state, area_manager_id, provider_id, product_id, analytic_account_id, unallocated,
+                total_amount, nb_expense
+            )
+            SELECT date, company_id, state, area_manager_id, provider_id, product_id, analytic_account_id, unallocated,
+                   SUM(amount),
+                   COUNT(*) FILTER (WHERE expense_row = 1)
+              FROM expense_share
+             GROUP BY date, company_id, state, area_manager_id, provider_id, product_id, analytic_account_id, unallocated
+            """,
+            company_ids=list(company_ids),
+            months=list(months),
+            sheet_month=SQL(SHEET_MONTH_SQL),
+            plan_id=project_plan.id,
+        ))
+        self.invalidate_model()
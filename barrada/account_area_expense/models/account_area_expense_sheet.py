@@ -1,8 +1,20 @@
+import logging
+import threading
+import time
+
+from markupsafe import escape
+
 from odoo import api, fields, models, _, Command
 from odoo.exceptions import ValidationError, AccessError, UserError
-from odoo.tools.misc import clean_context
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+from odoo.tools.misc import clean_context, split_every
 from odoo.addons.hr_expense.models.hr_expense_sheet import HrExpenseSheet
 
+from .account_area_expense_stat import instrumented
+
+_logger = logging.getLogger(__name__)
+
 
 class AccountAreaExpenseSheet(models.Model):
     _name = "account.area.expense.sheet"
@@ -55,27 +67,79 @@ class AccountAreaExpenseSheet(models.Model):
         copy=False,
     )
 
+    bulk_post_error = fields.Text("Bulk Posting Error", readonly=True, copy=False)
+
+    # Last background job of the sheet, see account.area.expense.job
+    background_job_id = fields.Many2one('account.area.expense.job', "Background Job", readonly=True, copy=False,
+                                        index='btree_not_null', ondelete='set null')
+    background_job_state = fields.Selection(related='background_job_id.state', string="Background Status")
+    background_job_progress = fields.Float(related='background_job_id.batch_progress', string="Background Progress")
+
+    # Bookkeeping of account.area.expense.report: the flag marks the sheets whose bucket must be rebuilt and the date
+    # is the month the sheet was last aggregated into
+    report_dirty = fields.Boolean(compute='_compute_report_dirty', store=True, copy=False)
+    report_bucket_date = fields.Date(readonly=True, copy=False)
+
+    def init(self):
+        super().init()
+        # _refresh_dirty_sheets looks for the flagged sheets at every commit touching a sheet
+        create_index(self.env.cr, 'account_area_expense_sheet_report_dirty_idx', self._table, ['id'], where='report_dirty')
+
+    @api.depends('state', 'accounting_date', 'company_id', 'area_manager_id', 'provider_id',
+                 'account_expense_line_ids.total_amount', 'account_expense_line_ids.product_id',
+                 'account_expense_line_ids.analytic_distribution')
+    def _compute_report_dirty(self):
+        self.report_dirty = True
+        precommit = self.env.cr.precommit
+        if not precommit.data.get('account_area_expense_report_refresh'):
+            precommit.data['account_area_expense_report_refresh'] = True
+            precommit.add(self.env['account.area.expense.report'].sudo()._refresh_dirty_sheets)
+
     def activity_update(self):
-        reports_requiring_feedback = self.env['account.area.expense.sheet']
-        reports_activity_unlink = self.env['account.area.expense.sheet']
-        for expense_report in self:
-            if expense_report.state == 'submit':
-                expense_report.activity_schedule(
-                    'hr_expense.mail_act_expense_approval',
-                    user_id=expense_report.sudo()._get_responsible_for_approval().id or self.env.user.id)
-            elif expense_report.state == 'approve':
-                reports_requiring_feedback |= expense_report
-            elif expense_report.state in {'draft', 'cancel'}:
-                reports_activity_unlink |= expense_report
+        reports_requiring_approval = self.filtered(lambda sheet: sheet.state == 'submit')
+        reports_requiring_feedback = self.filtered(lambda sheet: sheet.state == 'approve')
+        reports_activity_unlink = self.filtered(lambda sheet: sheet.state in {'draft', 'cancel'})
+        if reports_requiring_approval:
+            reports_requiring_approval._activity_schedule_approval()
         if reports_requiring_feedback:
-            reports_requiring_feedback.activity_feedback(['account.area.expense.mail_act_expense_approval'])
+            reports_requiring_feedback.activity_feedback(['hr_expense.mail_act_expense_approval'])
         if reports_activity_unlink:
-            reports_activity_unlink.activity_unlink(['account.area.expense.mail_act_expense_approval'])
+            reports_activity_unlink.activity_unlink(['hr_expense.mail_act_expense_approval'])
+
+    def _activity_schedule_approval(self):
+        """
+        Schedule the approval activity of every sheet with a single `mail.activity` create. Same values as
+        `activity_schedule`, which can only assign one user to all the records, while each sheet has its own responsible.
+        """
+        if self.env.context.get('mail_activity_automation_skip'):
+            return self.env['mail.activity']
+
+        activity_type = self.env.ref('hr_expense.mail_act_expense_approval')
+        responsibles = self.sudo()._get_responsibles_for_approval()
+        model_id = self.env['ir.model']._get_id(self._name)
+        date_deadline = activity_type._get_date_deadline()
+        return self.env['mail.activity'].with_context(clean_context(self.env.context)).create([{
+            'activity_type_id': activity_type.id,
+            'summary': activity_type.summary,
+            'automated': True,
+            'note': activity_type.default_note,
+            'date_deadline': date_deadline,
+            'res_model_id': model_id,
+            'res_id': sheet.id,
+            'user_id': responsibles[sheet].id or self.env.user.id,
+        } for sheet in self])
+
+    def _get_responsibles_for_approval(self):
+        """ :return: a dict {sheet: responsible user}, the approval chain of all the sheets being prefetched at once """
+        self.mapped('employee_id.parent_id.user_id')
+        self.mapped('employee_id.department_id.manager_id.user_id')
+        return {sheet: sheet._get_responsible_for_approval() for sheet in self}
 
     def write(self, values):
         res = super(HrExpenseSheet, self).write(values)
 
-        self.check_expense_lines()
+        lines_summary = self._get_expense_lines_summary()
+        self.check_expense_lines(lines_summary)
 
         user_is_accountant = self.env.user.has_group('account.group_account_user')
         edit_lines = 'expense_line_ids' in values
@@ -86,43 +150,58 @@ class AccountAreaExpenseSheet(models.Model):
                 _("You do not have the rights to add or remove any expenses on an approved or paid expense report."))
 
         # Ensures there is no empty expense report in a state different from draft or cancel
-        if edit_states or edit_lines:
-            for sheet in self.filtered(lambda sheet: not sheet.account_expense_line_ids):
-                if sheet.state in {'submit', 'approve', 'post',
-                                   'done'}:  # Empty expense report in a state different from draft or cancel
-                    if edit_lines and not sheet.account_expense_line_ids:  # If you try to remove all expenses from the sheet
-                        raise UserError(
-                            _("You cannot remove all expenses from a submitted, approved or paid expense report."))
-                    else:  # If you try to submit, approve, post or pay an empty sheet
-                        raise UserError(
-                            _("This expense report is empty. You cannot submit or approve an empty expense report."))
+        if (edit_states or edit_lines) and any(
+            sheet.id not in lines_summary and sheet.state in {'submit', 'approve', 'post', 'done'} for sheet in self
+        ):
+            if edit_lines:  # If you try to remove all expenses from the sheet
+                raise UserError(
+                    _("You cannot remove all expenses from a submitted, approved or paid expense report."))
+            else:  # If you try to submit, approve, post or pay an empty sheet
+                raise UserError(
+                    _("This expense report is empty. You cannot submit or approve an empty expense report."))
         return res
 
     @api.model_create_multi
     def create(self, vals):
         res = super(AccountAreaExpenseSheet, self).create(vals)
 
+        res.check_expense_lines()
         for sheet in res:
-            sheet.check_expense_lines()
-            if sheet.account_expense_line_ids:
-                sheet.provider_id = sheet.account_expense_line_ids[0].vendor_id.id
-                sheet.area_manager_id = sheet.account_expense_line_ids[0].area_manager_id.id
+            # Sheets created from expenses already receive these values, only the others need a write
+            first_line = sheet.account_expense_line_ids[:1]
+            if first_line and (sheet.provider_id != first_line.vendor_id or sheet.area_manager_id != first_line.area_manager_id):
+                sheet.write({
+                    'provider_id': first_line.vendor_id.id,
+                    'area_manager_id': first_line.area_manager_id.id,
+                })
 
         return res
 
-    def check_expense_lines(self):
-        self.ensure_one()
-        manager_area_select = False
-        company_select = False
-        if self.account_expense_line_ids:
-            for line in self.account_expense_line_ids:
-                if line.payment_account_mode == 'manager_area':
-                    manager_area_select = True
-                else:
-                    company_select = True
+    def unlink(self):
+        buckets = [(sheet.company_id.id, sheet.report_bucket_date) for sheet in self.sudo() if sheet.report_bucket_date]
+        res = super().unlink()
+        self.env['account.area.expense.report'].sudo()._refresh_buckets(buckets)
+        return res
 
-            if manager_area_select == company_select:
-                raise UserError(_("You cannot select expense lines with combined `Payment Method`."))
+    def _get_expense_lines_summary(self):
+        """
+        :return: a dict {sheet_id: (number of lines, number of distinct `payment_account_mode`)} for the sheets having
+                 expense lines, computed with one grouped query
+        """
+        return {
+            sheet.id: (count, payment_account_modes)
+            for sheet, count, payment_account_modes in self.env['account.area.expense'].sudo()._read_group(
+                [('account_sheet_id', 'in', self.ids)],
+                ['account_sheet_id'],
+                ['__count', 'payment_account_mode:count_distinct'],
+            )
+        }
+
+    def check_expense_lines(self, lines_summary=None):
+        if lines_summary is None:
+            lines_summary = self._get_expense_lines_summary()
+        if any(payment_account_modes > 1 for _count, payment_account_modes in lines_summary.values()):
+            raise UserError(_("You cannot select expense lines with combined `Payment Method`."))
 
     def _do_submit(self):
         self.write({
@@ -140,13 +219,15 @@ class AccountAreaExpenseSheet(models.Model):
             else:
                 sheet.journal_id = sheet.employee_journal_id
 
+    @instrumented('action_approve_expense_sheets')
     def action_approve_expense_sheets(self):
         self._check_can_approve()
         self._validate_analytic_distribution()
         self._check_can_approve_permission()
+        self.account_expense_line_ids._check_area_budget()
         duplicates = self.account_expense_line_ids.duplicate_expense_ids.filtered(lambda exp: exp.state in {'approved', 'done'})
         if duplicates:
-            action = self.env["ir.actions.act_window"]._for_xml_id('hr_expense.hr_expense_approve_duplicate_action')
+            action = self.env["ir.actions.act_window"]._for_xml_id('account_area_expense.action_account_area_expense_approve_duplicate')
             action['context'] = {'default_sheet_ids': self.ids, 'default_expense_ids': duplicates.ids}
             return action
         self._do_approve()
@@ -159,6 +240,7 @@ class AccountAreaExpenseSheet(models.Model):
         if any(not sheet.account_expense_line_ids for sheet in self):
             raise UserError(_("You cannot create accounting entries for an expense report without expenses."))
 
+    @instrumented('_do_create_moves')
     def _do_create_moves(self):
         """
         Creation of the account moves for the expenses report. Sudo-ed as they are created in draft and the manager may not have
@@ -171,43 +253,31 @@ class AccountAreaExpenseSheet(models.Model):
         own_account_sheets = self.filtered(lambda sheet: sheet.area_payment_mode == 'own_account')
         company_account_sheets = self - own_account_sheets
 
-        is_payment_mode_company = False
+        sheets_without_date = own_account_sheets.filtered(lambda sheet: not sheet.accounting_date)
+        default_accounting_dates = sheets_without_date._calculate_default_accounting_dates()
+        for accounting_date, sheets in sheets_without_date.grouped(lambda sheet: default_accounting_dates[sheet]).items():
+            sheets.accounting_date = accounting_date
+
+        values = []
         for sheet in own_account_sheets:
-            sheet.accounting_date = sheet.accounting_date or sheet._calculate_default_accounting_date()
-            for expense in sheet.account_expense_line_ids:
-                if expense.payment_account_mode == 'company':
-                    is_payment_mode_company = True
-                    break
-
-        values = [sheet._prepare_bills_vals() for sheet in own_account_sheets]
-
-        for val in values:
-            if is_payment_mode_company:
-                val.update({
-                    'partner_id': self.provider_id.id
-                })
+            val = sheet._prepare_bills_vals()
+            # The bill goes to the provider when the lines are paid to the company, else to the sheet creator
+            if any(expense.payment_account_mode == 'company' for expense in sheet.account_expense_line_ids):
+                val['partner_id'] = sheet.provider_id.id
             else:
-                val.update({
-                    'partner_id': self.create_uid.partner_id.id
-                })
+                val['partner_id'] = sheet.create_uid.partner_id.id
+            values.append(val)
 
         moves_sudo = self.env['account.move'].sudo().create(values)
 
         for move_sudo in moves_sudo:
             move_sudo._message_set_main_attachment_id(move_sudo.attachment_ids, force=True, filter_xml=False)
         if company_account_sheets:
-            move_vals_list, payment_vals_list = zip(*[
-                expense._prepare_payments_vals()
-                for expense in company_account_sheets.account_expense_line_ids
-            ])
+            move_vals_list, payment_vals_list = zip(*company_account_sheets.account_expense_line_ids._prepare_payments_vals_batch())
 
             if move_vals_list:
                 for move in move_vals_list:
-                    if 'expense_sheet_id' in move:
-                        expense_sheet_id = move.pop('expense_sheet_id')
-                    move.update({
-                        'account_area_expense_sheet_id': self.id
-                    })
+                    move.pop('expense_sheet_id', None)
 
                     for line in move.get('line_ids', []):
                         if line[2].get('expense_id', False):
@@ -237,26 +307,49 @@ class AccountAreaExpenseSheet(models.Model):
         Calculate the default accounting date for the expenses paid by employees
         """
         self.ensure_one()
+        return self._calculate_default_accounting_dates()[self]
+
+    def _calculate_default_accounting_dates(self):
+        """
+        Calculate the default accounting date of several sheets at once: the most recent expense date of every sheet
+        comes from one grouped query and the fiscal lock date is fetched once per (company, journal, user).
+        :return: a dict {sheet: default accounting date}
+        """
         today = fields.Date.context_today(self)
         start_month = fields.Date.start_of(today, "month")
         end_month = fields.Date.end_of(today, "month")
-        most_recent_expense = max(self.account_expense_line_ids.filtered(lambda exp: exp.date).mapped('date'), default=today)
-
-        if most_recent_expense > end_month:
-            return most_recent_expense
-
-        if most_recent_expense >= start_month:
-            return today
-
-        lock_date = self.company_id._get_user_fiscal_lock_date(self.journal_id)
-
-        return min(
-            max(
-                fields.Date.end_of(most_recent_expense, "month"),
-                fields.Date.end_of(fields.Date.add(lock_date, months=1), "month")
-            ),
-            today
-        )
+        most_recent_dates = dict(self.env['account.area.expense']._read_group(
+            [('account_sheet_id', 'in', self.ids), ('date', '!=', False)],
+            ['account_sheet_id'],
+            ['date:max'],
+        ))
+        lock_dates = {}
+
+        accounting_dates = {}
+        for sheet in self:
+            most_recent_expense = most_recent_dates.get(sheet, today)
+
+            if most_recent_expense > end_month:
+                accounting_dates[sheet] = most_recent_expense
+                continue
+
+            if most_recent_expense >= start_month:
+                accounting_dates[sheet] = today
+                continue
+
+            lock_date_key = (sheet.company_id, sheet.journal_id, self.env.user)
+            if lock_date_key not in lock_dates:
+                lock_dates[lock_date_key] = sheet.company_id._get_user_fiscal_lock_date(sheet.journal_id)
+            lock_date = lock_dates[lock_date_key]
+
+            accounting_dates[sheet] = min(
+                max(
+                    fields.Date.end_of(most_recent_expense, "month"),
+                    fields.Date.end_of(fields.Date.add(lock_date, months=1), "month")
+                ),
+                today
+            )
+        return accounting_dates
 
     def _prepare_bills_vals(self):
         self.ensure_one()
@@ -273,8 +366,8 @@ class AccountAreaExpenseSheet(models.Model):
             'currency_id': self.currency_id.id,
             'line_ids': [Command.create(expense._prepare_move_lines_vals()) for expense in self.account_expense_line_ids],
             'attachment_ids': [
-                Command.create(attachment.copy_data({'res_model': 'account.move', 'res_id': False, 'raw': attachment.raw})[0])
-                for attachment in self.account_expense_line_ids.message_main_attachment_id
+                Command.link(attachment.id)
+                for attachment in self.account_expense_line_ids.message_main_attachment_id.sudo()._copy_with_shared_blob({'res_model': 'account.move', 'res_id': False})
             ],
         }
 
@@ -299,6 +392,82 @@ class AccountAreaExpenseSheet(models.Model):
 
     @api.depends('area_account_move_ids.payment_state', 'area_account_move_ids.amount_residual', 'account_move_ids.payment_state', 'account_move_ids.amount_residual')
     def _compute_from_account_move_ids(self):
+        if not all(isinstance(sheet_id, int) for sheet_id in self.ids):
+            # New records (onchange) only have their moves in cache
+            self._compute_from_account_move_ids_per_sheet()
+            return
+
+        moves_data = self._get_account_move_aggregates()
+        for sheet in self:
+            area_moves = moves_data.get((sheet.id, True))
+            sheet_moves = moves_data.get((sheet.id, False))
+            moves = area_moves or sheet_moves
+            if sheet.payment_mode == 'company_account':
+                if area_moves and area_moves['has_non_draft']:
+                    # when the sheet is paid by the company, the state/amount of the related account_move_ids are not relevant
+                    # unless all moves have been reversed
+                    sheet.amount_residual = 0.
+                    if (sheet_moves and sheet_moves['has_not_reversed']) or area_moves['has_not_reversed']:
+                        sheet.payment_state = 'paid'
+                    else:
+                        sheet.payment_state = 'reversed'
+                else:
+                    sheet.amount_residual = moves['amount_residual'] if moves else 0.0
+                    payment_states = set(moves['payment_states']) if moves else set()
+                    if len(payment_states) <= 1:  # If only 1 move or only one state
+                        sheet.payment_state = payment_states.pop() if payment_states else 'not_paid'
+                    elif 'partial' in payment_states or 'paid' in payment_states:  # else if any are (partially) paid
+                        sheet.payment_state = 'partial'
+                    else:
+                        sheet.payment_state = 'not_paid'
+            else:
+                # Only one move is created when the expenses are paid by the employee
+                if (sheet_moves and sheet_moves['has_posted']) or (area_moves and area_moves['has_posted']):
+                    sheet.amount_residual = moves['amount_residual']
+                    sheet.payment_state = moves['first_payment_state']
+                else:
+                    sheet.amount_residual = 0.0
+                    sheet.payment_state = 'not_paid'
+
+    def _get_account_move_aggregates(self):
+        """
+        Aggregate the moves of the sheets in a single query, separately for `area_account_move_ids` (key `(sheet_id, True)`)
+        and `account_move_ids` (key `(sheet_id, False)`). The first payment state follows the `account.move` order, as
+        `moves[:1]` would.
+        """
+        self.env['account.move'].flush_model([
+            'state', 'payment_state', 'amount_residual', 'date', 'name', 'invoice_date',
+            'expense_sheet_id', 'account_area_expense_sheet_id', 'reversed_entry_id',
+        ])
+        self.env.cr.execute(SQL(
+            """
+            SELECT link.sheet_id,
+                   link.is_area,
+                   BOOL_OR(move.state != 'draft') AS has_non_draft,
+                   BOOL_OR(move.state = 'posted') AS has_posted,
+                   BOOL_OR(NOT EXISTS(
+                       SELECT 1 FROM account_move reversal WHERE reversal.reversed_entry_id = move.id
+                   )) AS has_not_reversed,
+                   SUM(move.amount_residual) AS amount_residual,
+                   ARRAY_AGG(DISTINCT move.payment_state) AS payment_states,
+                   (ARRAY_AGG(move.payment_state ORDER BY move.date DESC, move.name DESC, move.invoice_date DESC, move.id DESC))[1] AS first_payment_state
+              FROM (
+                    SELECT id AS move_id, account_area_expense_sheet_id AS sheet_id, TRUE AS is_area
+                      FROM account_move
+                     WHERE account_area_expense_sheet_id = ANY(%(sheet_ids)s)
+                     UNION ALL
+                    SELECT id AS move_id, expense_sheet_id AS sheet_id, FALSE AS is_area
+                      FROM account_move
+                     WHERE expense_sheet_id = ANY(%(sheet_ids)s)
+                   ) AS link
+              JOIN account_move move ON move.id = link.move_id
+             GROUP BY link.sheet_id, link.is_area
+            """,
+            sheet_ids=self.ids,
+        ))
+        return {(row['sheet_id'], row['is_area']): row for row in self.env.cr.dictfetchall()}
+
+    def _compute_from_account_move_ids_per_sheet(self):
         for sheet in self:
             if sheet.payment_mode == 'company_account':
                 if sheet.area_account_move_ids.filtered(lambda move: move.state != 'draft'):
@@ -370,6 +539,7 @@ class AccountAreaExpenseSheet(models.Model):
             case _:
                 return super()._track_subtype(init_values)
 
+    @instrumented('action_sheet_move_post')
     def action_sheet_move_post(self):
         is_area_sheet_context = self.env.context.get('account_area_expense_sheet', False)
         if not is_area_sheet_context:
@@ -393,6 +563,92 @@ class AccountAreaExpenseSheet(models.Model):
             # Post the company-paid expense through the payment instead, to post both at the same time
             company_sheets.area_account_move_ids.origin_payment_id.action_post()
 
+    def action_bulk_sheet_move_post(self):
+        """
+        Post the selected sheets in chunks, committing after each chunk so that a failing sheet does not roll back
+        the whole selection. The error of each failing sheet is kept in `bulk_post_error`; running the action again on
+        the same selection resumes with the sheets that are still waiting to be posted.
+        The chunk size is read from the `bulk_post_chunk_size` context key or the
+        `account_area_expense.bulk_post_chunk_size` system parameter.
+        """
+        chunk_size = self.env.context.get('bulk_post_chunk_size') or int(
+            self.env['ir.config_parameter'].sudo().get_param('account_area_expense.bulk_post_chunk_size', 100))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        sheets = self.filtered(lambda sheet: sheet.state == 'approve')
+        total = len(sheets)
+        posted_count = 0
+        failures = {}
+        start = time.monotonic()
+
+        for chunk_ids in split_every(max(chunk_size, 1), sheets.ids):
+            chunk = self.browse(chunk_ids)
+            try:
+                with self.env.cr.savepoint():
+                    chunk._bulk_post_chunk()
+                posted = chunk
+            except Exception:
+                # Isolate the failing sheets by posting the chunk one sheet at a time
+                posted = self.browse()
+                for sheet in chunk:
+                    try:
+                        with self.env.cr.savepoint():
+                            sheet._bulk_post_chunk()
+                        posted |= sheet
+                    except Exception as error:
+                        failures[sheet.id] = str(error)
+                        _logger.warning("Bulk posting of expense report %s failed: %s", sheet.id, error)
+
+            posted.filtered('bulk_post_error').bulk_post_error = False
+            for sheet_id in set(chunk_ids) & failures.keys():
+                self.browse(sheet_id).bulk_post_error = failures[sheet_id]
+            if auto_commit:
+                self.env.cr.commit()
+
+            posted_count += len(posted)
+            processed = posted_count + len(failures)
+            elapsed = time.monotonic() - start
+            rate = processed / elapsed if elapsed else 0.0
+            _logger.info(
+                "Bulk posting of expense reports: %s/%s processed, %s failed, %.2f sheets/s",
+                processed, total, len(failures), rate,
+            )
+
+        processed = posted_count + len(failures)
+        elapsed = time.monotonic() - start
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'warning' if failures else 'success',
+                'title': _("Bulk posting"),
+                'message': _(
+                    "%(posted)s of %(total)s expense reports posted, %(failed)s failed (%(rate).2f reports per second).",
+                    posted=posted_count, total=total, failed=len(failures),
+                    rate=processed / elapsed if elapsed else 0.0,
+                ),
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
+
+    def _bulk_post_chunk(self):
+        self.with_context(account_area_expense_sheet=True, expense_deferred_tracking=True).action_sheet_move_post()
+
+    def action_sheet_move_post_in_background(self):
+        sheets = self.filtered(lambda sheet: sheet.state == 'approve')
+        jobs = self.env['account.area.expense.job']._enqueue(sheets, '_bulk_post_chunk', name=_("Post expense reports"))
+        return self.env['account.area.expense.job']._get_enqueued_notification(jobs)
+
+    def action_reset_expense_sheets_in_background(self):
+        self.filtered(lambda sheet: sheet.state not in {'draft', 'submit'})._check_can_reset_approval()
+        jobs = self.env['account.area.expense.job']._enqueue(self, 'action_reset_expense_sheets', name=_("Reset expense reports"))
+        return self.env['account.area.expense.job']._get_enqueued_notification(jobs)
+
+    def _do_refuse_in_background(self, reason):
+        self._check_can_approve()
+        jobs = self.env['account.area.expense.job']._enqueue(self, '_do_refuse', args=[reason], name=_("Refuse expense reports"))
+        return self.env['account.area.expense.job']._get_enqueued_notification(jobs)
+
+    @instrumented('action_reset_expense_sheets')
     def action_reset_expense_sheets(self):
         self.filtered(lambda sheet: sheet.state not in {'draft', 'submit'})._check_can_reset_approval()
         self.sudo()._do_reverse_moves()
@@ -402,6 +658,7 @@ class AccountAreaExpenseSheet(models.Model):
         elif self.sudo().area_account_move_ids:
             self.sudo().area_account_move_ids = [Command.clear()]
 
+    @instrumented('action_register_payment')
     def action_register_payment(self):
         ''' Open the account.payment.register wizard to pay the selected journal entries.
         There can be more than one bank_account_id in the expense sheet when registering payment for multiple expenses.
@@ -458,24 +715,30 @@ class AccountAreaExpenseSheet(models.Model):
 
     def _do_refuse(self, reason):
         # Sudoed as approvers may not be accountants
-        if self.sudo().account_move_ids:
-            draft_moves_sudo = self.sudo().account_move_ids.filtered(lambda move: move.state == 'draft')
-        else:
-            draft_moves_sudo = self.sudo().area_account_move_ids.filtered(lambda move: move.state == 'draft')
+        self_sudo = self.sudo()
+        moves_sudo = self_sudo.account_move_ids | self_sudo.area_account_move_ids
+        draft_moves_sudo = moves_sudo.filtered(lambda move: move.state == 'draft')
 
-        if (self.sudo().account_move_ids - draft_moves_sudo) or (self.sudo().area_account_move_ids - draft_moves_sudo):
+        if moves_sudo - draft_moves_sudo:
             raise UserError(_("You cannot cancel an expense sheet linked to a posted journal entry"))
 
         if draft_moves_sudo:
             draft_moves_sudo.unlink()  # Else we have lingering moves
 
         self.approval_state = 'cancel'
+
+        # The template is rendered once for the whole batch, only the sheet name changes between the messages
+        name_placeholder = '__refused_sheet_name__'
+        body = self.env['ir.qweb']._render(
+            'hr_expense.hr_expense_template_refuse_reason',
+            {'reason': reason, 'name': name_placeholder},
+            minimal_qcontext=True,
+        )
         subtype_id = self.env['ir.model.data']._xmlid_to_res_id('mail.mt_comment')
         for sheet in self:
-            sheet.message_post_with_source(
-                'hr_expense.hr_expense_template_refuse_reason',
+            sheet.message_post(
+                body=body.replace(name_placeholder, escape(sheet.name or '')),
                 subtype_id=subtype_id,
-                render_values={'reason': reason, 'name': sheet.name},
             )
         self.activity_update()
 
@@ -0,0 +1,105 @@
+import functools
+import json
+import logging
+import threading
+import time
+
+from odoo import api, fields, models
+from odoo.tools import SQL, str2bool
+
+_logger = logging.getLogger(__name__)
+_stats_logger = logging.getLogger(__name__ + '.instrumentation')
+# (model, action) of the calls being measured by the current thread
+_active_calls = threading.local()
+
+
+def instrumented(action):
+    """
+    Measure the calls of an expense entry point when the `account_area_expense.instrumentation` system parameter is
+    set: wall time, number and duration of the SQL queries and number of records are sent to the
+    `...instrumentation` logger as JSON and stored in `account.area.expense.stat`.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            active = _active_calls.__dict__.setdefault('keys', set())
+            key = (self._name, action)
+            # An override of an instrumented method calling super() is measured once, by the outermost call
+            if key in active or not self.env['account.area.expense.stat']._is_enabled():
+                return method(self, *args, **kwargs)
+
+            thread = threading.current_thread()
+            # The cursor only counts the queries of the threads set up for it, as the HTTP workers are
+            for counter in ('query_count', 'query_time'):
+                if not hasattr(thread, counter):
+                    setattr(thread, counter, 0)
+            query_count, query_time = thread.query_count, thread.query_time
+            record_count = len(self)
+            start = time.perf_counter()
+            failed = True
+            active.add(key)
+            try:
+                result = method(self, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                active.discard(key)
+                measures = {
+                    'action': action,
+                    'model': self._name,
+                    'record_count': record_count,
+                    'duration': (time.perf_counter() - start) * 1000,
+                    'query_count': thread.query_count - query_count,
+                    'query_time': (thread.query_time - query_time) * 1000,
+                    'failed': failed,
+                    'uid': self.env.uid,
+                }
+                _stats_logger.info("%s", json.dumps(measures))
+                if not failed:
+                    # A failed call rolls the transaction back, the log is the only trace left
+                    self.env['account.area.expense.stat']._record(measures)
+        return wrapper
+    return decorator
+
+
+class AccountAreaExpenseStat(models.Model):
+    """ One row per instrumented call of an expense entry point, see `instrumented` """
+    _name = "account.area.expense.stat"
+    _description = "Expense Action Statistics"
+    _order = "call_date desc, id desc"
+    _rec_name = 'action'
+    _log_access = False
+
+    call_date = fields.Datetime("Date", readonly=True, index=True)
+    action = fields.Char("Action", readonly=True, index=True)
+    model = fields.Char("Model", readonly=True)
+    user_id = fields.Many2one('res.users', "User", readonly=True)
+    record_count = fields.Integer("# Records", readonly=True, aggregator='sum')
+    duration = fields.Float("Wall Time (ms)", readonly=True, aggregator='avg')
+    query_count = fields.Integer("# Queries", readonly=True, aggregator='avg')
+    query_time = fields.Float("Query Time (ms)", readonly=True, aggregator='avg')
+
+    @api.model
+    def _is_enabled(self):
+        return str2bool(self.env['ir.config_parameter'].sudo().get_param('account_area_expense.instrumentation', 'False'))
+
+    @api.model
+    def _record(self, measures):
+        """ Insert the measures of a call directly, without going through the ORM of the measured transaction """
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO account_area_expense_stat (call_date, action, model, user_id, record_count, duration, query_count, query_time)
+            VALUES (NOW() AT TIME ZONE 'UTC', %(action)s, %(model)s, %(uid)s, %(record_count)s, %(duration)s, %(query_count)s, %(query_time)s)
+            """,
+            **measures,
+        ))
+
+    @api.autovacuum
+    def _gc_stats(self):
+        """ Keep the statistics of the last `account_area_expense.instrumentation_days` days (90 by default) """
+        days = int(self.env['ir.config_parameter'].sudo().get_param('account_area_expense.instrumentation_days', 90))
+        self.env.cr.execute(SQL(
+            "DELETE FROM account_area_expense_stat WHERE call_date < NOW() AT TIME ZONE 'UTC' - make_interval(days => %s)",
+            days,
+        ))
+        _logger.info("GC'd %s expense action statistics", self.env.cr.rowcount)
@@ -8,11 +8,36 @@ from odoo.tools import SQL
 class AccountMoveLine(models.Model):
     _inherit = "account.move.line"
 
-    area_expense_id = fields.Many2one('account.area.expense', string='Expense Area', copy=True)
+    area_expense_id = fields.Many2one('account.area.expense', string='Expense Area', copy=True, index='btree_not_null')
 
     @api.constrains('account_id', 'display_type')
     def _check_payable_receivable(self):
-        super(AccountMoveLine, self.filtered(lambda line: line.move_id.account_area_expense_sheet_id.payment_mode != 'company_account'))._check_payable_receivable()
+        super(AccountMoveLine, self - self._get_company_paid_area_expense_lines())._check_payable_receivable()
+
+    def _get_company_paid_area_expense_lines(self):
+        """ Lines whose move is linked to an area expense sheet paid by the company, found with a single query """
+        area_moves = self.move_id.filtered('account_area_expense_sheet_id')
+        if not area_moves:
+            return self.browse()
+
+        area_moves.flush_recordset(['account_area_expense_sheet_id'])
+        self.env['account.area.expense'].flush_model(['account_sheet_id', 'payment_mode'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT move.id
+              FROM account_move move
+             WHERE move.id = ANY(%s)
+               AND EXISTS(
+                   SELECT 1
+                     FROM account_area_expense expense
+                    WHERE expense.account_sheet_id = move.account_area_expense_sheet_id
+                      AND expense.payment_mode = 'company_account'
+               )
+            """,
+            area_moves.ids,
+        ))
+        company_paid_move_ids = {move_id for move_id, in self.env.cr.fetchall()}
+        return self.filtered(lambda line: line.move_id.id in company_paid_move_ids)
 
     def _get_attachment_domains(self):
         attachment_domains = super(AccountMoveLine, self)._get_attachment_domains()
@@ -8,7 +8,7 @@ from odoo.exceptions import UserError
 class AccountPayment(models.Model):
     _inherit = "account.payment"
 
-    area_expense_sheet_id = fields.Many2one(related='move_id.account_area_expense_sheet_id')
+    area_expense_sheet_id = fields.Many2one(related='move_id.account_area_expense_sheet_id', store=True, index='btree_not_null')
 
     def _compute_outstanding_account_id(self):
         # EXTENDS account
@@ -0,0 +1,41 @@
+from odoo import models
+from odoo.tools import SQL
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    def _copy_with_shared_blob(self, default=None):
+        """
+        Copy the attachments without loading their content: copies of filestore attachments point to the same file
+        (same `store_fname`/`checksum`) instead of reading the bytes and writing them back. Attachments stored in the
+        database are copied the usual way.
+        The filestore garbage collector keeps a file as long as one attachment references it, so the copies can be
+        unlinked independently.
+        """
+        default = dict(default or {})
+        in_filestore = self.filtered('store_fname')
+        in_database = self - in_filestore
+
+        copies = self.create(in_filestore.copy_data({**default, 'raw': False}))
+        if copies:
+            self.flush_model()
+            self.env.cr.execute(SQL(
+                """
+                UPDATE ir_attachment AS copy
+                   SET store_fname = origin.store_fname,
+                       checksum = origin.checksum,
+                       file_size = origin.file_size,
+                       index_content = origin.index_content
+                  FROM ir_attachment AS origin,
+                       unnest(%s::int[], %s::int[]) AS pair(copy_id, origin_id)
+                 WHERE copy.id = pair.copy_id
+                   AND origin.id = pair.origin_id
+                """,
+                copies.ids, in_filestore.ids,
+            ))
+            copies.invalidate_recordset(['store_fname', 'checksum', 'file_size', 'index_content', 'raw', 'datas'])
+
+        if in_database:
+            copies |= self.create(in_database.copy_data(default))
+        return copies
@@ -0,0 +1,66 @@
+from odoo import models
+from odoo.tools.misc import clean_context
+
+# Models whose tracking is deferred in the bulk mode of the expense flows, the accounting documents and the other
+# records touched by the same flows keep the standard tracking
+EXPENSE_DEFERRED_TRACKING_MODELS = {'account.area.expense', 'account.area.expense.sheet', 'hr.expense', 'hr.expense.sheet'}
+
+
+class MailThread(models.AbstractModel):
+    _inherit = 'mail.thread'
+
+    def _track_prepare(self, fields_iter):
+        """ Remember the records tracked in bulk mode, as the precommit hook may run in the env of another caller """
+        if self.env.context.get('expense_deferred_tracking') and self._name in EXPENSE_DEFERRED_TRACKING_MODELS:
+            self.env.cr.precommit.data.setdefault(f'mail.tracking.deferred.{self._name}', set()).update(self.ids)
+        return super()._track_prepare(fields_iter)
+
+    def _track_finalize(self):
+        """
+        Bulk mode of the expense flows, enabled by the `expense_deferred_tracking` context key: the tracking values
+        of the expenses and expense reports (`EXPENSE_DEFERRED_TRACKING_MODELS`) collected during the transaction are
+        written as one summary message per record, all the messages being inserted by a single `create` instead of one
+        `message_post` per record. The messages keep the subtype, body and author of the change, but followers are not
+        notified and no tracking template is sent. The other models and the records tracked outside of the bulk mode
+        are processed as usual.
+        """
+        data = self.env.cr.precommit.data
+        deferred_ids = data.pop(f'mail.tracking.deferred.{self._name}', set())
+        initial_values = data.get(f'mail.tracking.{self._name}', {})
+        bodies = data.get(f'mail.tracking.message.{self._name}', {})
+        authors = data.get(f'mail.tracking.author.{self._name}', {})
+        # Taken out of the precommit data so that the standard processing only sees the other records
+        deferred_values = {id_: initial_values.pop(id_) for id_ in deferred_ids if initial_values.get(id_)}
+        deferred_bodies = {id_: bodies.pop(id_) for id_ in deferred_ids if id_ in bodies}
+        deferred_authors = {id_: authors.pop(id_) for id_ in deferred_ids if id_ in authors}
+
+        if deferred_values:
+            self._track_finalize_deferred(deferred_values, deferred_bodies, deferred_authors)
+        return super()._track_finalize()
+
+    def _track_finalize_deferred(self, initial_values, bodies, authors):
+        records = self.browse(list(initial_values)).sudo().with_context(clean_context(self._context)).exists()
+        tracked_fields = records.fields_get(records._track_get_fields(), attributes=('string', 'type', 'selection', 'currency_field'))
+        note_id = self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note')
+        author_id = self.env.user.partner_id.id
+
+        messages_vals = []
+        for record in records:
+            changes, tracking_value_ids = record._mail_track(tracked_fields, initial_values[record.id])
+            if not tracking_value_ids:
+                continue
+            subtype = record._track_subtype({fname: initial_values[record.id][fname] for fname in changes})
+            messages_vals.append({
+                'model': record._name,
+                'res_id': record.id,
+                'message_type': 'notification',
+                'subtype_id': subtype.id if subtype else note_id,
+                'author_id': authors[record.id].id if record.id in authors else author_id,
+                # A body set with _track_set_log_message takes priority, even when empty
+                'body': bodies[record.id] if record.id in bodies else record._track_get_default_log_message(changes),
+                'tracking_value_ids': tracking_value_ids,
+            })
+        if messages_vals:
+            self.env['mail.message'].sudo().create(messages_vals)
+        # Called after the main flush, right before the commit: flush what the messages may have triggered
+        self.env.flush_all()
@@ -0,0 +1,7 @@
+from . import test_account_area_budget
+from . import test_account_area_expense_job
+from . import test_account_area_expense_sheet
+from . import test_account_move_line
+from . import test_mail_thread
+from . import test_performance
+from . import test_query_plans
@@ -0,0 +1,121 @@
+import logging
+import time
+from itertools import count
+
+from odoo import Command
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests.common import new_test_user
+
+_logger = logging.getLogger(__name__)
+
+# Number of records the scaling checks run on, the first run being the reference of the others
+SIZES = (1, 100, 1000)
+
+SHEET_STATES = ['draft', 'submit', 'approve', 'post', 'done']
+
+
+class AccountAreaExpenseCommon(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        company = cls.company_data['company']
+        company.expense_journal_id = cls.company_data['default_journal_purchase']
+        cls.env.user.groups_id |= (
+            cls.env.ref('hr_expense.group_hr_expense_manager')
+            | cls.env.ref('account_area_expense.group_accountant')
+            | cls.env.ref('account_area_expense.group_treasury')
+        )
+
+        cls.area_employee = cls.env['hr.employee'].create({
+            'name': 'Area Employee',
+            'user_id': cls.env.user.id,
+            'work_contact_id': cls.env.user.partner_id.id,
+            'company_id': company.id,
+        })
+        cls.area_manager = new_test_user(
+            cls.env, login='area_manager', groups='base.group_user,account_area_expense.group_area_manager',
+            company_id=company.id,
+        )
+        cls.area_product = cls.env['product.product'].create({
+            'name': 'Area Expense',
+            'type': 'service',
+            'can_be_expensed': True,
+            'standard_price': 0.0,
+            'supplier_taxes_id': [Command.clear()],
+            'property_account_expense_id': cls.company_data['default_account_expense'].id,
+        })
+        # One vendor per expense of a batch, so that each expense is reported in a sheet of its own
+        cls.area_vendors = cls.env['res.partner'].create([
+            {'name': 'Area Vendor %s' % index} for index in range(max(SIZES))
+        ])
+        # Distinct amounts in all the batches of a test, so that no expense is taken for a duplicate
+        cls.expense_amounts = count(1)
+
+    def _create_area_expenses(self, size, **values):
+        return self.env['account.area.expense'].create([{
+            'name': 'Area expense %s' % index,
+            'employee_id': self.area_employee.id,
+            'product_id': self.area_product.id,
+            'total_amount_currency': next(self.expense_amounts),
+            'area_manager_id': self.area_manager.id,
+            'vendor_id': self.area_vendors[index].id,
+            **values,
+        } for index in range(size)])
+
+    def _create_area_sheets(self, size, state='draft'):
+        """ Create `size` area sheets of one expense each, taken to `state` through the buttons of the sheet form """
+        expenses = self._create_area_expenses(size)
+        sheets = self.env['account.area.expense.sheet'].create(expenses._get_default_expense_sheet_values())
+        return self._advance_sheets(sheets.with_context(account_area_expense_sheet=True), state)
+
+    def _advance_sheets(self, sheets, state):
+        target = SHEET_STATES.index(state)
+        if target >= SHEET_STATES.index('submit'):
+            sheets.action_submit_sheet()
+        if target >= SHEET_STATES.index('approve'):
+            sheets._do_approve()
+        if target >= SHEET_STATES.index('post'):
+            sheets.action_sheet_move_post()
+        if target >= SHEET_STATES.index('done'):
+            self._register_payment(sheets)
+        return sheets
+
+    def _register_payment(self, sheets):
+        """ Pay the sheets with the wizard opened by their Pay button """
+        action = sheets.action_register_payment()
+        return self.env[action['res_model']].with_context(action['context']).create({})._create_payments()
+
+    def _measure(self, operation, records):
+        """ :return: the number of queries and the duration of `operation(records)`, run from an empty cache """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        operation(records)
+        self.env.flush_all()
+        return self.cr.sql_log_count - queries, time.perf_counter() - start
+
+    def _assert_scaling(self, prepare, operation, queries_per_record=0, seconds_per_record=0.005):
+        """
+        Run `operation` on the records returned by `prepare(size)` for each of `SIZES`, and check each run against the
+        single-record run: it must issue the same number of queries, plus `queries_per_record` per added record for
+        the steps whose work per record cannot be batched, and take at most `seconds_per_record` more per record.
+        The single-record run is made twice so that the reference is measured with the same warm caches as the larger
+        runs.
+        """
+        self._measure(operation, prepare(1))
+        reference, reference_duration = self._measure(operation, prepare(1))
+        _logger.info("%s on 1 record: %s queries, %.3fs", self._testMethodName, reference, reference_duration)
+
+        for size in SIZES[1:]:
+            with self.subTest(size=size):
+                records = prepare(size)
+                self.env.invalidate_all()
+                start = time.perf_counter()
+                with self.assertQueryCount(reference + queries_per_record * (size - 1)):
+                    operation(records)
+                duration = time.perf_counter() - start
+                _logger.info("%s on %s records: %.3fs", self._testMethodName, size, duration)
+                self.assertLess(duration, reference_duration + seconds_per_record * size,
+                                "%s is too slow on %s records" % (self._testMethodName, size))
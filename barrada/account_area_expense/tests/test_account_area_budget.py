@@ -0,0 +1,43 @@
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import AccountAreaExpenseCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAccountAreaBudget(AccountAreaExpenseCommon):
+
+    def setUp(self):
+        super().setUp()
+        today = fields.Date.context_today(self.env.user)
+        self.budget = self.env['account.area.budget'].create({
+            'name': 'Area Budget',
+            'area_manager_id': self.area_manager.id,
+            'date_from': fields.Date.start_of(today, 'year'),
+            'date_to': fields.Date.end_of(today, 'year'),
+            'amount': 150.0,
+        })
+
+    def _submit(self, amount):
+        expense = self._create_area_expenses(1, total_amount_currency=amount)
+        expense.action_submit_expenses()
+        return expense.account_sheet_id
+
+    def test_submission_exceeding_the_budget(self):
+        self._submit(100.0)
+        self.assertEqual(self.budget.committed_amount, 100.0)
+        with self.assertRaisesRegex(UserError, 'Area Budget'):
+            self._submit(100.0)
+
+    def test_approval_on_exceeded_budget(self):
+        """ Approving expenses already committed adds nothing to the budget, even exceeded, and is not blocked """
+        sheet = self._submit(100.0)
+        self.budget.amount = 50.0
+        sheet.action_submit_sheet()
+        sheet.action_approve_expense_sheets()
+        self.assertEqual(sheet.state, 'approve')
+        self.assertEqual((self.budget.committed_amount, self.budget.approved_amount), (0.0, 100.0))
+        # New expenses are still refused on the exceeded budget
+        with self.assertRaises(UserError):
+            self._submit(10.0)
@@ -0,0 +1,23 @@
+from odoo.tests import tagged
+
+from .common import AccountAreaExpenseCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAccountAreaExpenseJob(AccountAreaExpenseCommon):
+
+    def test_skip_records_no_longer_expected(self):
+        """ The sheets processed by hand after being enqueued are skipped when the job runs """
+        sheets = self._create_area_sheets(3, 'approve')
+        jobs = self.env['account.area.expense.job']._enqueue(sheets, '_bulk_post_chunk', chunk_size=3)
+        posted_by_hand, refused = sheets[:2]
+        posted_by_hand.action_sheet_move_post()
+        refused._do_refuse("Refused before the job")
+
+        with self.assertLogs('odoo.addons.account_area_expense.models.account_area_expense_job', 'INFO') as capture:
+            jobs._run()
+
+        self.assertEqual(jobs.state, 'done')
+        self.assertIn(str(sorted((posted_by_hand | refused).ids)), capture.output[0])
+        self.assertEqual(sheets.mapped('state'), ['post', 'cancel', 'post'])
+        self.assertEqual(len(posted_by_hand.area_account_move_ids), 1)
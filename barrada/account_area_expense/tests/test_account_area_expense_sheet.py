@@ -0,0 +1,50 @@
+from odoo.tests import tagged
+
+from .common import AccountAreaExpenseCommon, SIZES
+
+
+@tagged('post_install', '-at_install')
+class TestAccountAreaExpenseSheet(AccountAreaExpenseCommon):
+
+    def test_compute_from_account_move_ids_query_count(self):
+        """ The payment state and residual of the sheets are computed with the same queries whatever their number """
+        reference = None
+        for size in SIZES:
+            with self.subTest(size=size):
+                sheets = self._create_area_sheets(size, 'post')
+                self.env.flush_all()
+                self.env.invalidate_all()
+                for fname in ('payment_state', 'amount_residual'):
+                    self.env.add_to_compute(sheets._fields[fname], sheets)
+
+                # The computed values are written at the next flush, one UPDATE per distinct residual: not counted
+                if reference is None:
+                    queries = self.cr.sql_log_count
+                    sheets._recompute_recordset(['payment_state', 'amount_residual'])
+                    reference = self.cr.sql_log_count - queries
+                else:
+                    with self.assertQueryCount(reference, flush=False):
+                        sheets._recompute_recordset(['payment_state', 'amount_residual'])
+
+                self.assertEqual(set(sheets.mapped('payment_state')), {'not_paid'})
+                self.assertEqual(sheets.mapped('amount_residual'), sheets.mapped('total_amount'))
+
+    def test_activity_schedule_approval_query_count(self):
+        """ The approval activities of the submitted sheets are created with the same queries whatever their number """
+        activity_type = self.env.ref('hr_expense.mail_act_expense_approval')
+        reference = None
+        for size in SIZES:
+            with self.subTest(size=size):
+                sheets = self._create_area_sheets(size)
+                sheets.with_context(mail_activity_automation_skip=True).action_submit_sheet()
+                self.env.invalidate_all()
+
+                if reference is None:
+                    reference, _duration = self._measure(lambda sheets: sheets.activity_update(), sheets)
+                else:
+                    with self.assertQueryCount(reference):
+                        sheets.activity_update()
+
+                activities = sheets.activity_ids.filtered(lambda activity: activity.activity_type_id == activity_type)
+                self.assertEqual(sorted(activities.mapped('res_id')), sorted(sheets.ids))
+                self.assertEqual(activities.user_id, self.env.user)
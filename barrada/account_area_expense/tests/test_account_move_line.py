@@ -0,0 +1,36 @@
+from odoo import Command
+from odoo.tests import tagged
+from odoo.addons.account_area_expense.models.account_move_line import AccountMoveLine
+
+from .common import AccountAreaExpenseCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAccountMoveLine(AccountAreaExpenseCommon):
+
+    def _count_check_queries(self, lines):
+        """ :return: the queries of the payable/receivable check of `lines` with and without the area exclusion """
+        unfiltered_queries, _duration = self._measure(
+            lambda lines: super(AccountMoveLine, lines)._check_payable_receivable(), lines,
+        )
+        queries, _duration = self._measure(lambda lines: lines._check_payable_receivable(), lines)
+        return queries, unfiltered_queries
+
+    def test_check_payable_receivable_unrelated_lines_query_count(self):
+        """ The lines of moves without area sheet are left out of the exclusion without any query of their own """
+        moves = self.env['account.move'].create([{
+            'move_type': 'entry',
+            'journal_id': self.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({'name': 'Debit', 'account_id': self.company_data['default_account_expense'].id, 'debit': 10.0}),
+                Command.create({'name': 'Credit', 'account_id': self.company_data['default_account_revenue'].id, 'credit': 10.0}),
+            ],
+        } for _index in range(10)])
+        queries, unfiltered_queries = self._count_check_queries(moves.line_ids)
+        self.assertEqual(queries, unfiltered_queries)
+
+    def test_check_payable_receivable_area_lines_query_count(self):
+        """ The lines of moves linked to an area sheet are checked for company-paid expenses with a single query """
+        sheets = self._create_area_sheets(10, 'post')
+        queries, unfiltered_queries = self._count_check_queries(sheets.area_account_move_ids.line_ids)
+        self.assertEqual(queries, unfiltered_queries + 1)
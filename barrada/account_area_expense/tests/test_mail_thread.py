@@ -0,0 +1,40 @@
+from odoo.addons.mail.tests.common import DISABLED_MAIL_CONTEXT
+from odoo.tests import tagged
+
+from .common import AccountAreaExpenseCommon
+
+
+@tagged('post_install', '-at_install')
+class TestExpenseDeferredTracking(AccountAreaExpenseCommon):
+
+    def setUp(self):
+        super().setUp()
+        # The tracking may be disabled by the accounting test setup, it is what is tested here
+        self.env = self.env(context={key: value for key, value in self.env.context.items() if key not in DISABLED_MAIL_CONTEXT})
+
+    def _flush_tracking(self):
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+
+    def test_bulk_mode_keeps_move_notifications(self):
+        """ The bulk mode only defers the tracking of the expense models, the moves posted in the same flow notify their followers """
+        subtype_validated = self.env.ref('account.mt_invoice_validated')
+        sheet = self._create_area_sheets(1, 'approve')
+        invoice = self.init_invoice('out_invoice', partner=self.partner_a, amounts=[100.0])
+        invoice.message_subscribe(partner_ids=self.partner_b.ids, subtype_ids=subtype_validated.ids)
+        self._flush_tracking()
+        previous_sheet_messages = sheet.message_ids
+
+        sheet._bulk_post_chunk()
+        invoice.with_context(expense_deferred_tracking=True).action_post()
+        self._flush_tracking()
+
+        validated_message = invoice.message_ids.filtered(lambda message: message.subtype_id == subtype_validated)
+        self.assertEqual(len(validated_message), 1)
+        self.assertIn(self.partner_b, validated_message.notification_ids.res_partner_id)
+        self.assertTrue(sheet.area_account_move_ids.message_ids.tracking_value_ids, "The bill must keep its tracking")
+
+        # The sheet itself is tracked by a summary message, without notification
+        sheet_message = (sheet.message_ids - previous_sheet_messages).filtered(lambda message: message.tracking_value_ids)
+        self.assertEqual(len(sheet_message), 1)
+        self.assertFalse(sheet_message.notification_ids)
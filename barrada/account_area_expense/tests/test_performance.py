@@ -0,0 +1,154 @@
+import logging
+import time
+import tracemalloc
+
+from odoo import Command
+from odoo.tests import tagged
+from odoo.tools.misc import split_every
+from odoo.addons.account_area_expense.models.account_move_line import AccountMoveLine
+
+from .common import AccountAreaExpenseCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'perf')
+class TestAccountAreaExpensePerformance(AccountAreaExpenseCommon):
+    """ Query and time budgets of the area expense flow, each step being run on 1, 100 and 1,000 records """
+
+    def _measure_memory(self, operation, records):
+        """ :return: the peak of the Python memory allocated by `operation(records)` and its duration """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            operation(records)
+            self.env.flush_all()
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, time.perf_counter() - start
+
+    def test_perf_submit(self):
+        def submit(expenses):
+            expenses.action_submit_expenses()
+            expenses.account_sheet_id.action_submit_sheet()
+
+        self._assert_scaling(self._create_area_expenses, submit)
+
+    def test_perf_approve(self):
+        self._assert_scaling(
+            lambda size: self._create_area_sheets(size, 'submit'),
+            lambda sheets: sheets.action_approve_expense_sheets(),
+        )
+
+    def test_perf_do_create_moves(self):
+        self._assert_scaling(
+            lambda size: self._create_area_sheets(size, 'approve'),
+            lambda sheets: sheets._do_create_moves(),
+        )
+
+    def test_perf_action_sheet_move_post(self):
+        # Each bill takes its number from the journal sequence on its own when posted
+        self._assert_scaling(
+            lambda size: self._create_area_sheets(size, 'approve'),
+            lambda sheets: sheets.action_sheet_move_post(),
+            queries_per_record=2, seconds_per_record=0.01,
+        )
+
+    def test_perf_register_payment(self):
+        # One payment is created per bill, then numbered, posted and reconciled with its bill on its own
+        self._assert_scaling(
+            lambda size: self._create_area_sheets(size, 'post'),
+            self._register_payment,
+            queries_per_record=8, seconds_per_record=0.02,
+        )
+
+    def test_perf_reset_expense_sheets(self):
+        # Each bill is reversed by a credit note numbered and reconciled with it on its own
+        self._assert_scaling(
+            lambda size: self._create_area_sheets(size, 'post'),
+            lambda sheets: sheets.action_reset_expense_sheets(),
+            queries_per_record=8, seconds_per_record=0.02,
+        )
+
+    def test_perf_receipt_copies(self):
+        """ Memory and time of the receipt copies made for the bills: sharing the blob against reading it back """
+        receipt_size = 1024 * 1024
+        sheets = self._create_area_sheets(100, 'approve')
+        receipts = self.env['ir.attachment'].create([{
+            'name': 'receipt-%s.pdf' % expense.id,
+            'raw': b'%%PDF-1.4\n%%%d\n' % expense.id + b'0' * receipt_size,
+            'mimetype': 'application/pdf',
+            'res_model': 'account.area.expense',
+            'res_id': expense.id,
+        } for expense in sheets.account_expense_line_ids])
+        for expense, receipt in zip(sheets.account_expense_line_ids, receipts):
+            expense.message_main_attachment_id = receipt
+
+        copy_peak, copy_duration = self._measure_memory(lambda attachments: attachments.create([
+            attachment.copy_data({'res_model': 'account.move', 'res_id': False, 'raw': attachment.raw})[0]
+            for attachment in attachments
+        ]), receipts)
+        shared_peak, shared_duration = self._measure_memory(
+            lambda attachments: attachments._copy_with_shared_blob({'res_model': 'account.move', 'res_id': False}),
+            receipts,
+        )
+        _logger.info(
+            "Copy of %s receipts: %.1f MiB in %.2fs with their content, %.1f MiB in %.2fs with a shared blob",
+            len(receipts), copy_peak / 2 ** 20, copy_duration, shared_peak / 2 ** 20, shared_duration,
+        )
+        self.assertLess(shared_peak * 10, copy_peak)
+        self.assertLess(shared_duration, copy_duration)
+
+        post_peak, post_duration = self._measure_memory(lambda sheets: sheets.action_sheet_move_post(), sheets)
+        _logger.info(
+            "Posting of %s sheets with a receipt: %.1f KiB and %.3fs per sheet",
+            len(sheets), post_peak / len(sheets) / 2 ** 10, post_duration / len(sheets),
+        )
+        # The receipts are never loaded: posting takes less memory than half of their content
+        self.assertLess(post_peak, receipt_size * len(sheets) / 2)
+        self.assertEqual(
+            set(sheets.area_account_move_ids.attachment_ids.mapped('store_fname')), set(receipts.mapped('store_fname')),
+        )
+
+    def test_perf_import_unrelated_move_lines(self):
+        """
+        Import of 100,000 move lines unrelated to the area expenses, then their payable/receivable check with and without
+        the area exclusion: the exclusion must not add a query and its timings are logged to follow them over time
+        """
+        moves_count, lines_per_move = 1000, 100
+        expense_account = self.company_data['default_account_expense']
+        revenue_account = self.company_data['default_account_revenue']
+        journal = self.company_data['default_journal_misc']
+
+        start = time.perf_counter()
+        move_ids = []
+        for batch in split_every(100, range(moves_count)):
+            move_ids.extend(self.env['account.move'].create([{
+                'move_type': 'entry',
+                'journal_id': journal.id,
+                'line_ids': [
+                    *(Command.create({
+                        'name': 'Imported line %s.%s' % (index, line),
+                        'account_id': expense_account.id,
+                        'debit': 1.0,
+                    }) for line in range(lines_per_move - 1)),
+                    Command.create({'name': 'Imported line %s' % index, 'account_id': revenue_account.id, 'credit': lines_per_move - 1.0}),
+                ],
+            } for index in batch]).ids)
+            self.env.flush_all()
+        import_duration = time.perf_counter() - start
+        lines = self.env['account.move'].browse(move_ids).line_ids
+        self.assertEqual(len(lines), moves_count * lines_per_move)
+
+        unfiltered_queries, unfiltered_duration = self._measure(
+            lambda lines: super(AccountMoveLine, lines)._check_payable_receivable(), lines,
+        )
+        queries, duration = self._measure(lambda lines: lines._check_payable_receivable(), lines)
+        _logger.info(
+            "Import of %s move lines: %.2fs; payable/receivable check: %s queries in %.2fs, %s queries in %.2fs without "
+            "the area exclusion", len(lines), import_duration, queries, duration, unfiltered_queries, unfiltered_duration,
+        )
+        self.assertEqual(queries, unfiltered_queries)
@@ -0,0 +1,50 @@
+from odoo.tests import tagged
+from odoo.tools import SQL
+from odoo.tools.sql import index_exists
+
+from .common import AccountAreaExpenseCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAccountAreaExpenseQueryPlans(AccountAreaExpenseCommon):
+    """ The lookups of the area expense links must go through their indexes """
+
+    def setUp(self):
+        super().setUp()
+        self.sheets = self._create_area_sheets(5, 'post')
+        self.expenses = self.sheets.account_expense_line_ids
+
+    def assertQueryUsesIndex(self, model, domain, index_name):
+        self.assertTrue(index_exists(self.env.cr, index_name), "Missing index %s" % index_name)
+        Model = self.env[model].sudo()
+        Model.flush_model()
+        query = Model._search(domain)
+        # The test tables are small enough for a sequential scan to win: only the choice between indexes is checked
+        self.env.cr.execute(SQL("ANALYZE %s", SQL.identifier(Model._table)))
+        self.env.cr.execute(SQL("SET LOCAL enable_seqscan = off"))
+        try:
+            self.env.cr.execute(SQL("EXPLAIN %s", query.select()))
+            plan = "\n".join(line for line, in self.env.cr.fetchall())
+        finally:
+            self.env.cr.execute(SQL("RESET enable_seqscan"))
+        self.assertIn(index_name, plan, "The query on %s does not use %s:\n%s" % (model, index_name, plan))
+
+    def test_move_line_area_expense_id_index(self):
+        self.assertQueryUsesIndex(
+            'account.move.line', [('area_expense_id', 'in', self.expenses.ids)], 'account_move_line__area_expense_id_index',
+        )
+
+    def test_payment_area_expense_sheet_id_index(self):
+        self.assertQueryUsesIndex(
+            'account.payment', [('area_expense_sheet_id', 'in', self.sheets.ids)], 'account_payment__area_expense_sheet_id_index',
+        )
+
+    def test_move_account_area_expense_sheet_id_index(self):
+        self.assertQueryUsesIndex(
+            'account.move', [('account_area_expense_sheet_id', 'in', self.sheets.ids)], 'account_move__account_area_expense_sheet_id_index',
+        )
+
+    def test_expense_account_sheet_id_index(self):
+        self.assertQueryUsesIndex(
+            'account.area.expense', [('account_sheet_id', 'in', self.sheets.ids)], 'account_area_expense__account_sheet_id_index',
+        )
@@ -0,0 +1,4 @@
+from . import account_area_expense_import
+from . import account_area_expense_sheet_export
+from . import account_area_expense_sheet_refuse
+from . import account_area_expense_approve_duplicate
@@ -0,0 +1,18 @@
+from odoo import fields, models, _
+
+
+class AccountAreaExpenseApproveDuplicate(models.TransientModel):
+    """ Confirmation asked when approving area expense reports having expenses with the same fingerprint as approved ones """
+    _name = "account.area.expense.approve.duplicate"
+    _description = "Approve Duplicated Area Expenses"
+
+    sheet_ids = fields.Many2many('account.area.expense.sheet', string="Expense Reports")
+    expense_ids = fields.Many2many('account.area.expense', string="Duplicated Expenses", readonly=True)
+
+    def action_approve(self):
+        self.sheet_ids._do_approve()
+        return {'type': 'ir.actions.act_window_close'}
+
+    def action_refuse(self):
+        self.sheet_ids._do_refuse(_("Duplicate Expense"))
+        return {'type': 'ir.actions.act_window_close'}
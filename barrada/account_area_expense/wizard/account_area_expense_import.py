@@ -0,0 +1,432 @@
+import contextlib
+import csv
+import datetime
+import io
+import logging
+import os
+import re
+
+from odoo import api, fields, models, _, Command
+from odoo.exceptions import UserError
+from odoo.tools.misc import split_every
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+# Accepted (lowercase) headers of each imported column
+IMPORT_COLUMNS = {
+    'description': {'description', 'name', 'descripción', 'descripcion'},
+    'date': {'date', 'fecha'},
+    'product': {'product', 'product_id', 'category', 'producto', 'categoría', 'categoria'},
+    'quantity': {'quantity', 'cantidad'},
+    'total': {'total', 'total_amount', 'total_amount_currency', 'amount', 'importe', 'monto'},
+    'taxes': {'taxes', 'tax_ids', 'impuestos'},
+    'vendor': {'vendor', 'vendor_id', 'provider', 'proveedor'},
+    'area_manager': {'area_manager', 'area_manager_id', 'area manager', 'responsable de área', 'responsable de area'},
+    'payment_mode': {'payment_mode', 'payment_account_mode', 'payment mode', 'modo de pago'},
+    'notes': {'notes', 'notas'},
+}
+REQUIRED_COLUMNS = ('product', 'total')
+# Number with an optional sign, thousands separator and decimal separator, filled with the escaped separators
+NUMBER_PATTERN = r'[+-]?(\d{1,3}(%(thousands)s\d{3})+|\d+)(%(decimal)s\d+)?'
+
+
+class AccountAreaExpenseImport(models.TransientModel):
+    """
+    Import area expenses from a CSV, XLSX or XLS file. Rows are streamed and created in batches: the products,
+    vendors, taxes and area managers of a batch are resolved with one search per model and kept in lookup dicts for
+    the following batches, and a row that cannot be imported is reported without stopping the others.
+    """
+    _name = "account.area.expense.import"
+    _description = "Import Area Expenses"
+
+    file = fields.Binary("File", required=True)
+    filename = fields.Char("File Name")
+    batch_size = fields.Integer("Batch Size", default=500, required=True,
+                                help="Number of rows created at once")
+    decimal_separator = fields.Selection(
+        selection=[('auto', 'Automatic'), ('.', 'Point (1,234.56)'), (',', 'Comma (1.234,56)')],
+        string="Decimal Separator", default='auto', required=True,
+        help="Separator of the decimals in the amounts written as text. Automatic takes the last of the point and the "
+             "comma, and rejects the amounts where it cannot tell, such as 1.234.",
+    )
+    submit = fields.Boolean("Create reports",
+                            help="Report the imported expenses, grouped in sheets as when submitting them from the list")
+    state = fields.Selection([('draft', 'Draft'), ('done', 'Done')], default='draft')
+    expense_ids = fields.Many2many('account.area.expense', string="Imported Expenses", readonly=True)
+    sheet_ids = fields.Many2many('account.area.expense.sheet', string="Created Reports", readonly=True)
+    expense_count = fields.Integer(compute='_compute_counts')
+    sheet_count = fields.Integer(compute='_compute_counts')
+    error_log = fields.Text("Errors", readonly=True)
+
+    @api.depends('expense_ids', 'sheet_ids')
+    def _compute_counts(self):
+        for wizard in self:
+            wizard.expense_count = len(wizard.expense_ids)
+            wizard.sheet_count = len(wizard.sheet_ids)
+
+    # -------------------------------------------------------------------------
+    # READING
+    # -------------------------------------------------------------------------
+
+    def _iter_rows(self):
+        """ :return: an iterator on the rows of the file, each row being a tuple of cell values """
+        extension = os.path.splitext(self.filename or '')[1].lower()
+        with self._open_file() as file:
+            if extension == '.xlsx':
+                yield from self._iter_xlsx_rows(file)
+            elif extension == '.xls':
+                yield from self._iter_xls_rows(file)
+            else:
+                yield from self._iter_csv_rows(file)
+
+    @contextlib.contextmanager
+    def _open_file(self):
+        """ Open the uploaded file for reading, from the filestore when it is stored there instead of decoding it """
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as file:
+                yield file
+        else:
+            yield io.BytesIO(attachment.raw or b'')
+
+    @api.model
+    def _iter_csv_rows(self, file):
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(text, dialect):
+            yield tuple(row)
+
+    @api.model
+    def _iter_xlsx_rows(self, file):
+        if load_workbook is None:
+            raise UserError(_("The openpyxl library is required to import XLSX files."))
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    @api.model
+    def _iter_xls_rows(self, file):
+        if xlrd is None:
+            raise UserError(_("The xlrd library is required to import XLS files."))
+        # xlrd cannot read from a stream, the legacy format is limited to 65536 rows anyway
+        workbook = xlrd.open_workbook(file_contents=file.read(), on_demand=True)
+        sheet = workbook.sheet_by_index(0)
+        for row in sheet.get_rows():
+            yield tuple(
+                xlrd.xldate_as_datetime(cell.value, workbook.datemode) if cell.ctype == xlrd.XL_CELL_DATE else cell.value
+                for cell in row
+            )
+
+    @api.model
+    def _get_column_indexes(self, header):
+        """ :return: a dict {column: index of the column in the rows} from the header row """
+        headers = [str(title or '').strip().lower() for title in header]
+        indexes = {}
+        for column, aliases in IMPORT_COLUMNS.items():
+            for index, title in enumerate(headers):
+                if title in aliases:
+                    indexes[column] = index
+                    break
+        missing = [column for column in REQUIRED_COLUMNS if column not in indexes]
+        if missing:
+            raise UserError(_("The file must have the following columns: %s", ", ".join(missing)))
+        return indexes
+
+    @api.model
+    def _read_row(self, row, indexes):
+        """ :return: a dict {column: value} of the row, False for the empty cells """
+        data = {}
+        for column, index in indexes.items():
+            value = row[index] if index < len(row) else None
+            if isinstance(value, str):
+                value = value.strip()
+            data[column] = value if value not in (None, '') else False
+        return data
+
+    # -------------------------------------------------------------------------
+    # LOOKUPS
+    # -------------------------------------------------------------------------
+
+    def _fill_lookups(self, rows, lookups):
+        """
+        Resolve the products, vendors, taxes and area managers of the rows that are not in `lookups` yet, with one
+        search per model. Unknown values are kept as False so that they are not searched again.
+        """
+        company = self.env.company
+        missing = {kind: set() for kind in lookups}
+        for _row_number, data in rows:
+            for kind in ('product', 'vendor', 'area_manager'):
+                if data.get(kind):
+                    missing[kind].add(self._lookup_key(data[kind]))
+            if data.get('taxes'):
+                missing['tax'].update(self._split_taxes(data['taxes']))
+        for kind, keys in missing.items():
+            keys -= lookups[kind].keys()
+
+        if missing['product']:
+            keys = list(missing['product'])
+            products = self.env['product.product'].search([
+                *self.env['product.product']._check_company_domain(company),
+                ('can_be_expensed', '=', True),
+                '|', ('default_code', 'in', keys), ('name', 'in', keys),
+            ], order='id')
+            self._store_lookup(lookups['product'], keys, products, ('default_code', 'name'))
+        if missing['vendor']:
+            keys = list(missing['vendor'])
+            partners = self.env['res.partner'].search([
+                *self.env['res.partner']._check_company_domain(company),
+                '|', ('vat', 'in', keys), ('name', 'in', keys),
+            ], order='id')
+            self._store_lookup(lookups['vendor'], keys, partners, ('vat', 'name'))
+        if missing['area_manager']:
+            keys = list(missing['area_manager'])
+            users = self.env['res.users'].search(['|', ('login', 'in', keys), ('name', 'in', keys)], order='id')
+            self._store_lookup(lookups['area_manager'], keys, users, ('login', 'name'))
+        if missing['tax']:
+            keys = list(missing['tax'])
+            taxes = self.env['account.tax'].search([
+                *self.env['account.tax']._check_company_domain(company),
+                ('type_tax_use', '=', 'purchase'),
+                ('name', 'in', keys),
+            ], order='sequence, id')
+            self._store_lookup(lookups['tax'], keys, taxes, ('name',))
+
+    @api.model
+    def _store_lookup(self, lookup, keys, records, key_fields):
+        """ Map each key to the first record matching it on `key_fields`, the first fields taking precedence """
+        for field_name in reversed(key_fields):
+            for record in reversed(records):
+                if record[field_name]:
+                    lookup[record[field_name]] = record.id
+        for key in keys:
+            lookup.setdefault(key, False)
+
+    @api.model
+    def _lookup_key(self, value):
+        """ Spreadsheets return the numeric codes as floats: 1234.0 is looked up as '1234' """
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    @api.model
+    def _split_taxes(self, value):
+        return [name.strip() for name in str(value).split(',') if name.strip()]
+
+    # -------------------------------------------------------------------------
+    # IMPORT
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _parse_date(self, value):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        for date_format in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+            try:
+                return datetime.datetime.strptime(str(value), date_format).date()
+            except ValueError:
+                continue
+        raise UserError(_("Invalid date: %s", value))
+
+    def _parse_float(self, value, column):
+        if isinstance(value, (int, float)):
+            return float(value)
+        text = re.sub(r'\s', '', str(value))
+        decimal_separator = self.decimal_separator
+        if decimal_separator == 'auto':
+            decimal_separator = self._guess_decimal_separator(text, column)
+        thousands_separator = ',' if decimal_separator == '.' else '.'
+        pattern = NUMBER_PATTERN % {'thousands': re.escape(thousands_separator), 'decimal': re.escape(decimal_separator)}
+        if not re.fullmatch(pattern, text):
+            raise UserError(_("Invalid number in column %(column)s: %(value)s", column=column, value=value))
+        return float(text.replace(thousands_separator, '').replace(decimal_separator, '.'))
+
+    @api.model
+    def _guess_decimal_separator(self, text, column):
+        """
+        :return: the decimal separator of a number written as text: the last of the point and the comma when both are
+                 used, the thousands separator being the other one; a separator used once is the decimal separator
+                 unless exactly three digits follow it, which could be thousands, e.g. 1.234
+        """
+        separators = [char for char in text if char in '.,']
+        if not separators:
+            return '.'
+        if len(set(separators)) > 1:
+            return separators[-1]
+        separator = separators[0]
+        if len(separators) > 1:
+            # 1.234.567: only thousands
+            return ',' if separator == '.' else '.'
+        if re.fullmatch(r'[+-]?\d{1,3}%s\d{3}' % re.escape(separator), text):
+            raise UserError(_(
+                "Ambiguous number in column %(column)s: %(value)s, set the decimal separator of the import.",
+                column=column, value=text,
+            ))
+        return separator
+
+    @api.model
+    def _parse_payment_mode(self, value):
+        selection = self.env['account.area.expense']._fields['payment_account_mode']._description_selection(self.env)
+        for key, label in selection:
+            if str(value).lower() in (key, str(label).lower()):
+                return key
+        raise UserError(_("Invalid payment mode: %s", value))
+
+    def _prepare_expense_vals(self, data, lookups):
+        """ :return: the values of the expense of a row, raising a UserError if the row cannot be imported """
+        vals = {'company_id': self.env.company.id}
+
+        product_id = data['product'] and lookups['product'].get(self._lookup_key(data['product']))
+        if not product_id:
+            raise UserError(_("Unknown expense category: %s", data['product'] or ''))
+        vals['product_id'] = product_id
+        if data.get('total') is False:
+            raise UserError(_("The total is required."))
+        vals['total_amount_currency'] = self._parse_float(data['total'], 'total')
+
+        if data.get('description'):
+            vals['name'] = str(data['description'])
+        if data.get('date'):
+            vals['date'] = self._parse_date(data['date'])
+        if data.get('quantity'):
+            vals['quantity'] = self._parse_float(data['quantity'], 'quantity')
+        if data.get('notes'):
+            vals['description'] = str(data['notes'])
+        if data.get('payment_mode'):
+            vals['payment_account_mode'] = self._parse_payment_mode(data['payment_mode'])
+        if data.get('vendor'):
+            vals['vendor_id'] = lookups['vendor'].get(self._lookup_key(data['vendor']))
+            if not vals['vendor_id']:
+                raise UserError(_("Unknown vendor: %s", data['vendor']))
+        elif vals.get('payment_account_mode') == 'company':
+            raise UserError(_("A vendor is required for the expenses paid by the company."))
+        if data.get('area_manager'):
+            vals['area_manager_id'] = lookups['area_manager'].get(self._lookup_key(data['area_manager']))
+            if not vals['area_manager_id']:
+                raise UserError(_("Unknown area manager: %s", data['area_manager']))
+        if data.get('taxes'):
+            tax_ids = []
+            for name in self._split_taxes(data['taxes']):
+                if not lookups['tax'].get(name):
+                    raise UserError(_("Unknown tax: %s", name))
+                tax_ids.append(lookups['tax'][name])
+            vals['tax_ids'] = [Command.set(tax_ids)]
+        return vals
+
+    def _import_batch(self, batch, indexes, lookups, errors):
+        """
+        Create the expenses of a batch of rows in one `create`. If the batch fails, its rows are created one at a
+        time to report the failing ones.
+        :return: the created expenses
+        """
+        rows = [
+            (row_number, self._read_row(row, indexes))
+            for row_number, row in batch
+            if any(cell not in (None, '') for cell in row)
+        ]
+        self._fill_lookups(rows, lookups)
+
+        vals_list = []
+        row_numbers = []
+        for row_number, data in rows:
+            try:
+                vals_list.append(self._prepare_expense_vals(data, lookups))
+                row_numbers.append(row_number)
+            except UserError as error:
+                errors.append(_("Row %(row)s: %(error)s", row=row_number, error=error.args[0]))
+
+        Expense = self.env['account.area.expense'].with_context(
+            mail_create_nolog=True, mail_create_nosubscribe=True, expense_deferred_tracking=True,
+        )
+        try:
+            with self.env.cr.savepoint():
+                return Expense.create(vals_list)
+        except Exception:
+            expenses = Expense
+            for row_number, vals in zip(row_numbers, vals_list):
+                try:
+                    with self.env.cr.savepoint():
+                        expenses |= Expense.create(vals)
+                except Exception as error:
+                    errors.append(_("Row %(row)s: %(error)s", row=row_number, error=error.args[0] if error.args else error))
+            return expenses
+
+    def action_import(self):
+        self.ensure_one()
+        rows = self._iter_rows()
+        header = next(rows, None)
+        if not header:
+            raise UserError(_("The file is empty."))
+        indexes = self._get_column_indexes(header)
+        lookups = {'product': {}, 'vendor': {}, 'area_manager': {}, 'tax': {}}
+        expenses = self.env['account.area.expense']
+        errors = []
+
+        for batch in split_every(max(self.batch_size, 1), enumerate(rows, start=2)):
+            expenses |= self._import_batch(batch, indexes, lookups, errors)
+            _logger.info("Import of area expenses: %s expenses created, %s rows failed", len(expenses), len(errors))
+
+        sheets = self.env['account.area.expense.sheet']
+        if self.submit and expenses:
+            try:
+                with self.env.cr.savepoint():
+                    expenses.with_context(expense_deferred_tracking=True).action_submit_expenses()
+                sheets = expenses.account_sheet_id
+            except UserError as error:
+                errors.append(_("The reports could not be created: %s", error.args[0]))
+
+        self.write({
+            'state': 'done',
+            'expense_ids': [Command.set(expenses.ids)],
+            'sheet_ids': [Command.set(sheets.ids)],
+            'error_log': "\n".join(errors) or False,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'views': [[False, 'form']],
+            'target': 'new',
+        }
+
+    def action_view_expenses(self):
+        self.ensure_one()
+        return {
+            'name': _('Imported Expenses'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.area.expense',
+            'views': [[False, "list"], [False, "form"]],
+            'domain': [('id', 'in', self.expense_ids.ids)],
+        }
+
+    def action_view_sheets(self):
+        self.ensure_one()
+        return {
+            'name': _('New Expense Reports'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.area.expense.sheet',
+            'views': [[False, "list"], [False, "form"]],
+            'domain': [('id', 'in', self.sheet_ids.ids)],
+        }
@@ -0,0 +1,278 @@
+import datetime
+
+import xlsxwriter
+
+from odoo import fields, models, _
+from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools import SQL
+
+# Number of sheets read at once: the cache is emptied after each chunk so that memory does not grow with the export
+EXPORT_CHUNK_SIZE = 500
+
+
+class AccountAreaExpenseSheetExport(models.TransientModel):
+    """
+    Export the area expense sheets of a period with their lines, journal entries and payments to an XLSX file.
+    The sheets are read in keyset-paginated chunks along the model order and the file is written with XlsxWriter in
+    `constant_memory` mode, which flushes every row to disk, so memory stays flat whatever the number of rows.
+    """
+    _name = "account.area.expense.sheet.export"
+    _description = "Export Area Expense Reports"
+
+    date_from = fields.Date("From", required=True,
+                            default=lambda self: fields.Date.start_of(fields.Date.context_today(self), 'year'))
+    date_to = fields.Date("Until", required=True,
+                          default=lambda self: fields.Date.end_of(fields.Date.context_today(self), 'year'))
+    state = fields.Selection(
+        selection=lambda self: self.env['account.area.expense.sheet']._fields['state'].selection,
+        string="Status",
+        help="Only export the reports in this status",
+    )
+
+    def action_export(self):
+        self.ensure_one()
+        if self.date_from > self.date_to:
+            raise UserError(_("The start date must be before the end date."))
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/account_area_expense/sheet_export/{self.id}',
+            'target': 'self',
+        }
+
+    def _get_export_domain(self):
+        domain = [
+            ('company_id', 'in', self.env.companies.ids),
+            ('accounting_date', '>=', self.date_from),
+            ('accounting_date', '<=', self.date_to),
+        ]
+        if self.state:
+            domain.append(('state', '=', self.state))
+        return domain
+
+    def _get_export_filename(self):
+        return _("Expense reports %(date_from)s - %(date_to)s.xlsx", date_from=self.date_from, date_to=self.date_to)
+
+    # -------------------------------------------------------------------------
+    # READING
+    # -------------------------------------------------------------------------
+
+    def _iter_sheet_chunks(self):
+        """
+        Iterate on the sheets to export by chunks of `EXPORT_CHUNK_SIZE`, following the model order
+        (accounting date then id, descending). Each chunk starts after the last sheet of the previous one, so the
+        chunks cost the same whatever their position, unlike an offset.
+        """
+        Sheet = self.env['account.area.expense.sheet']
+        domain = self._get_export_domain()
+        last = None
+        while True:
+            sheets = Sheet.search_fetch(
+                expression.AND([domain, self._get_keyset_domain(last)]),
+                self._get_sheet_export_fields(),
+                order='accounting_date DESC NULLS FIRST, id DESC',
+                limit=EXPORT_CHUNK_SIZE,
+            )
+            if not sheets:
+                return
+            yield sheets
+            last = sheets[-1].accounting_date, sheets[-1].id
+            # Drop the records of the chunk from the cache before reading the next one
+            self.env.invalidate_all()
+
+    def _get_keyset_domain(self, last):
+        """ :return: the domain of the sheets after `last`, a (accounting_date, id) tuple, in the export order """
+        if not last:
+            return []
+        accounting_date, sheet_id = last
+        if accounting_date:
+            return ['|', ('accounting_date', '<', accounting_date),
+                    '&', ('accounting_date', '=', accounting_date), ('id', '<', sheet_id)]
+        # Sheets without accounting date come first
+        return ['|', ('accounting_date', '!=', False),
+                '&', ('accounting_date', '=', False), ('id', '<', sheet_id)]
+
+    def _get_sheet_export_fields(self):
+        return [
+            'name', 'company_id', 'area_manager_id', 'provider_id', 'employee_id', 'state', 'accounting_date',
+            'area_payment_mode', 'currency_id', 'untaxed_amount', 'total_tax_amount', 'total_amount',
+            'payment_state', 'amount_residual',
+        ]
+
+    def _get_line_export_fields(self):
+        return [
+            'account_sheet_id', 'date', 'name', 'product_id', 'vendor_id', 'quantity', 'tax_ids', 'currency_id',
+            'untaxed_amount_currency', 'tax_amount_currency', 'total_amount_currency', 'total_amount',
+            'analytic_distribution', 'payment_account_mode',
+        ]
+
+    def _get_sheet_payments(self, sheets):
+        """
+        :return: a dict {sheet_id: payments} of the payments of the sheets: the payments created from the sheets and
+                 the payments reconciled with their journal entries, fetched with one query
+        """
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            """
+            SELECT payment.area_expense_sheet_id, payment.id
+              FROM account_payment payment
+             WHERE payment.area_expense_sheet_id = ANY(%(sheet_ids)s)
+             UNION
+            SELECT sheet_move.account_area_expense_sheet_id, payment.id
+              FROM account_move sheet_move
+              JOIN account_move_line line ON line.move_id = sheet_move.id
+              JOIN account_partial_reconcile partial ON line.id IN (partial.debit_move_id, partial.credit_move_id)
+              JOIN account_move_line counterpart ON counterpart.id IN (partial.debit_move_id, partial.credit_move_id)
+                                                AND counterpart.move_id != sheet_move.id
+              JOIN account_payment payment ON payment.move_id = counterpart.move_id
+             WHERE sheet_move.account_area_expense_sheet_id = ANY(%(sheet_ids)s)
+            """,
+            sheet_ids=sheets.ids,
+        ))
+        payment_ids_by_sheet = {}
+        for sheet_id, payment_id in self.env.cr.fetchall():
+            payment_ids_by_sheet.setdefault(sheet_id, []).append(payment_id)
+        payments = self.env['account.payment'].browse(
+            payment_id for payment_ids in payment_ids_by_sheet.values() for payment_id in payment_ids
+        )
+        payments.fetch(['name', 'date', 'journal_id', 'amount', 'currency_id', 'state'])
+        return {
+            sheet_id: payments.browse(payment_ids).sorted(lambda payment: (payment.date, payment.id))
+            for sheet_id, payment_ids in payment_ids_by_sheet.items()
+        }
+
+    # -------------------------------------------------------------------------
+    # WRITING
+    # -------------------------------------------------------------------------
+
+    def _get_sheet_headers(self):
+        return [
+            _("ID"), _("Report"), _("Company"), _("Area Manager"), _("Provider"), _("Employee"), _("Status"),
+            _("Accounting Date"), _("Paid By"), _("Untaxed Amount"), _("Taxes"), _("Total"), _("Currency"),
+            _("Payment Status"), _("Amount Due"),
+        ]
+
+    def _get_line_headers(self):
+        return [
+            _("Report ID"), _("Report"), _("Date"), _("Description"), _("Category"), _("Vendor"), _("Quantity"),
+            _("Taxes"), _("Untaxed Amount"), _("Tax Amount"), _("Total"), _("Currency"), _("Total in Company Currency"),
+            _("Analytic Distribution"), _("Payment Mode"),
+        ]
+
+    def _get_move_headers(self):
+        return [
+            _("Report ID"), _("Report"), _("Journal Entry"), _("Date"), _("Journal"), _("Status"), _("Payment Status"),
+            _("Total"), _("Amount Due"), _("Currency"),
+        ]
+
+    def _get_payment_headers(self):
+        return [_("Report ID"), _("Report"), _("Payment"), _("Date"), _("Journal"), _("Amount"), _("Currency"), _("Status")]
+
+    def _write_xlsx(self, output):
+        """ Write the export to `output`, a file name or a binary file object """
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        formats = {
+            'header': workbook.add_format({'bold': True}),
+            'date': workbook.add_format({'num_format': 'yyyy-mm-dd'}),
+        }
+        labels = {
+            (model, field_name): dict(self.env[model]._fields[field_name]._description_selection(self.env))
+            for model, field_name in (
+                ('account.area.expense.sheet', 'state'),
+                ('account.area.expense.sheet', 'area_payment_mode'),
+                ('account.area.expense.sheet', 'payment_state'),
+                ('account.area.expense', 'payment_account_mode'),
+                ('account.move', 'state'),
+                ('account.move', 'payment_state'),
+                ('account.payment', 'state'),
+            )
+        }
+        worksheets = {}
+        rows = {}
+        for key, title, headers in (
+            ('sheet', _("Reports"), self._get_sheet_headers()),
+            ('line', _("Lines"), self._get_line_headers()),
+            ('move', _("Journal Entries"), self._get_move_headers()),
+            ('payment', _("Payments"), self._get_payment_headers()),
+        ):
+            worksheets[key] = workbook.add_worksheet(title)
+            self._write_row(worksheets[key], 0, headers, formats, cell_format=formats['header'])
+            rows[key] = 1
+
+        def write(key, values):
+            self._write_row(worksheets[key], rows[key], values, formats)
+            rows[key] += 1
+
+        for sheets in self._iter_sheet_chunks():
+            lines = self.env['account.area.expense'].search_fetch(
+                [('account_sheet_id', 'in', sheets.ids)],
+                self._get_line_export_fields(),
+            )
+            lines_by_sheet = lines.grouped('account_sheet_id')
+            analytic_names = self._get_analytic_names(lines)
+            moves_by_sheet = self.env['account.move'].search_fetch(
+                [('account_area_expense_sheet_id', 'in', sheets.ids)],
+                ['account_area_expense_sheet_id', 'name', 'date', 'journal_id', 'state', 'payment_state',
+                 'amount_total', 'amount_residual', 'currency_id'],
+                order='date, id',
+            ).grouped('account_area_expense_sheet_id')
+            payments_by_sheet = self._get_sheet_payments(sheets)
+
+            for sheet in sheets:
+                write('sheet', [
+                    sheet.id, sheet.name, sheet.company_id.name, sheet.area_manager_id.name, sheet.provider_id.name,
+                    sheet.employee_id.name, labels['account.area.expense.sheet', 'state'].get(sheet.state), sheet.accounting_date,
+                    labels['account.area.expense.sheet', 'area_payment_mode'].get(sheet.area_payment_mode),
+                    sheet.untaxed_amount, sheet.total_tax_amount, sheet.total_amount, sheet.currency_id.name,
+                    labels['account.area.expense.sheet', 'payment_state'].get(sheet.payment_state), sheet.amount_residual,
+                ])
+                for line in lines_by_sheet.get(sheet, ()):
+                    write('line', [
+                        sheet.id, sheet.name, line.date, line.name, line.product_id.display_name, line.vendor_id.name,
+                        line.quantity, ", ".join(line.tax_ids.mapped('name')), line.untaxed_amount_currency,
+                        line.tax_amount_currency, line.total_amount_currency, line.currency_id.name, line.total_amount,
+                        self._format_analytic_distribution(line.analytic_distribution, analytic_names),
+                        labels['account.area.expense', 'payment_account_mode'].get(line.payment_account_mode),
+                    ])
+                for move in moves_by_sheet.get(sheet, ()):
+                    write('move', [
+                        sheet.id, sheet.name, move.name, move.date, move.journal_id.name,
+                        labels['account.move', 'state'].get(move.state),
+                        labels['account.move', 'payment_state'].get(move.payment_state),
+                        move.amount_total, move.amount_residual, move.currency_id.name,
+                    ])
+                for payment in payments_by_sheet.get(sheet.id, ()):
+                    write('payment', [
+                        sheet.id, sheet.name, payment.name, payment.date, payment.journal_id.name, payment.amount,
+                        payment.currency_id.name, labels['account.payment', 'state'].get(payment.state),
+                    ])
+        workbook.close()
+
+    def _get_analytic_names(self, lines):
+        """ :return: a dict {analytic account id (str): name} of the accounts distributed on the lines """
+        account_ids = {
+            int(account_id)
+            for distribution in lines.mapped('analytic_distribution') if distribution
+            for key in distribution
+            for account_id in key.split(',')
+        }
+        accounts = self.env['account.analytic.account'].browse(account_ids).exists()
+        return {str(account.id): account.display_name for account in accounts}
+
+    def _format_analytic_distribution(self, distribution, analytic_names):
+        """ :return: the distribution as "Account: 50%; Other account, Plan account: 50%" """
+        if not distribution:
+            return False
+        return "; ".join(
+            "%s: %s%%" % (", ".join(analytic_names.get(account_id, account_id) for account_id in key.split(',')), percentage)
+            for key, percentage in distribution.items()
+        )
+
+    def _write_row(self, worksheet, row, values, formats, cell_format=None):
+        for column, value in enumerate(values):
+            if value is False or value is None:
+                continue
+            if isinstance(value, datetime.date):
+                worksheet.write_datetime(row, column, value, formats['date'])
+            else:
+                worksheet.write(row, column, value, cell_format)
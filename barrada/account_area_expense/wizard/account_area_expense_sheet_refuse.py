@@ -0,0 +1,14 @@
+from odoo import fields, models
+
+
+class AccountAreaExpenseSheetRefuse(models.TransientModel):
+    """ Reason of the refusal of area expense reports refused in background """
+    _name = "account.area.expense.sheet.refuse"
+    _description = "Refuse Area Expense Reports in Background"
+
+    reason = fields.Char("Reason", required=True)
+    sheet_ids = fields.Many2many('account.area.expense.sheet', string="Expense Reports")
+
+    def action_refuse(self):
+        self.ensure_one()
+        return self.sheet_ids._do_refuse_in_background(self.reason)
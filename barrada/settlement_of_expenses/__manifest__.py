@@ -1,6 +1,6 @@
 {
     'name': 'HR Expense Travel Extension',
-    'version': '1.0',
+    'version': '1.1',
     'category': 'Human Resources/Expenses',
     'summary': 'Complete management of employee advances, settlements, and expense reimbursements',
     'description': """
@@ -38,8 +38,11 @@
     'website': 'https://pakcore.net/',
     'depends': ['account_area_expense', 'hr_expense'],
     'data': [
+        'security/ir.model.access.csv',
         'views/res_config_settings_views.xml',
         'views/hr_expense_views.xml',
+        'views/hr_expense_liquidation_report_views.xml',
+        'wizard/hr_expense_liquidation_report_generate_views.xml',
 
             ],
     'installable': True,
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from odoo import api, SUPERUSER_ID
+from odoo.tools import SQL
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    _migrate_journal_settings(env)
+    _recompute_liquidation_totals(env)
+
+
+def _migrate_journal_settings(env):
+    """ Move the expense journal settings stored in global system parameters to the companies """
+    params = env['ir.config_parameter']
+
+    # The settings field stored the flag of every company under this single key
+    if params.get_param('company_id.expense_claim_use_same_journal'):
+        env['res.company'].search([]).write({'expense_claim_use_same_journal': True})
+    params.set_param('company_id.expense_claim_use_same_journal', False)
+
+    # The reimbursement journal was global, it goes to the company of the journal
+    journal_id = params.get_param('hr_expense.reimbursement_journal_id')
+    journal = env['account.journal'].browse(int(journal_id) if journal_id else []).exists()
+    if journal and not journal.company_id.expense_reimbursement_journal_id:
+        journal.company_id.expense_reimbursement_journal_id = journal
+    params.set_param('hr_expense.reimbursement_journal_id', False)
+
+
+def _recompute_liquidation_totals(env):
+    """
+    The settlement totals of the expense reports are now stored computed fields, but `refund` and
+    `total_experiences_verified` kept the values of their former columns: compute the three totals of every report
+    from its lines at once
+    """
+    env.cr.execute(SQL(
+        """
+        UPDATE hr_expense_sheet sheet
+           SET total_real_expenses = COALESCE(totals.real_expenses, 0),
+               total_experiences_verified = COALESCE(totals.verified_expenses, 0),
+               refund = COALESCE(totals.refund, 0)
+          FROM hr_expense_sheet target
+          LEFT JOIN (
+                SELECT sheet_id,
+                       SUM(real_expenses) AS real_expenses,
+                       SUM(real_expenses) FILTER (WHERE verified) AS verified_expenses,
+                       SUM(refund) AS refund
+                  FROM hr_expense
+                 WHERE sheet_id IS NOT NULL
+                 GROUP BY sheet_id
+               ) AS totals ON totals.sheet_id = target.id
+         WHERE sheet.id = target.id
+        """
+    ))
@@ -1,6 +1,9 @@
 from . import hr_expense_sheet
 from . import hr_expense
+from . import hr_expense_liquidation_report
 from . import res_config_settings
 from . import res_company
+from . import hr_expense_generator
+from . import account_area_expense_job
 
 
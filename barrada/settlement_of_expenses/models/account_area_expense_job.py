@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from odoo import api, models
+
+
+class AccountAreaExpenseJob(models.Model):
+    _inherit = 'account.area.expense.job'
+
+    @api.model
+    def _get_allowed_methods(self):
+        return super()._get_allowed_methods() | {
+            ('hr.expense.sheet', '_settle_advances'): [
+                ('state', '=', 'done'), ('settled_report', '=', False), ('is_liquidation', '=', False),
+            ],
+        }
@@ -2,6 +2,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 
+from odoo.addons.account_area_expense.models.account_area_expense_stat import instrumented
+
 
 class HrExpense(models.Model):
     _inherit = 'hr.expense'
@@ -35,6 +37,10 @@ class HrExpense(models.Model):
         help='Negative: employee owes money to the company\nPositive: company owes money to employee'
     )
 
+    @instrumented('action_submit_expenses')
+    def action_submit_expenses(self):
+        return super().action_submit_expenses()
+
      # CALCULO DE DIFERENCIA ENTRE DOS CAMPOS
     @api.depends('real_expenses', 'total_amount')
     def _compute_diferenc(self):
@@ -49,20 +55,3 @@ class HrExpense(models.Model):
      for expense in self:
         expense.total_expenses_verified = expense.real_expenses if expense.verified else 0.0
 
-
-     # Asegurar diario al validar reporte
-     def action_sheet_move_create(self):
-         """Garantizar que las facturas usen el diario de gastos configurado"""
-         company = self.company_id or self.env.company
-
-         if company.expense_claim_use_same_journal and company.expense_journal_id:
-             # Forzar contexto para que account.move.create use el diario correcto
-             self = self.with_context(
-                 default_journal_id=company.expense_journal_id.id,
-                 force_expense_journal=True
-             )
-
-         return super().action_sheet_move_create()
-
-
-
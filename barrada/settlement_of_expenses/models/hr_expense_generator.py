@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import datetime
+import random
+
+from odoo import api, fields, models, Command
+from odoo.tools.misc import split_every
+
+
+class AccountAreaExpenseGenerator(models.AbstractModel):
+    _inherit = 'account.area.expense.generator'
+
+    @api.model
+    def _get_default_volumes(self):
+        return {
+            **super()._get_default_volumes(),
+            'advances': 2000,
+            'advance_lines': 3,
+            'settled_ratio': 0.5,
+        }
+
+    @api.model
+    def generate(self, seed=0, batch_size=2000, auto_commit=False, **volumes):
+        data = super().generate(seed=seed, batch_size=batch_size, auto_commit=auto_commit, **volumes)
+        volumes = {**self._get_default_volumes(), **volumes}
+        generator = self.with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True,
+            generator_batch_size=batch_size, generator_auto_commit=auto_commit,
+        )
+        # Draw from a generator of its own so that the area expenses do not change with the advance volumes
+        rng = random.Random('%s-advances' % seed)
+        data['advances'] = generator._generate_advances(rng, 'GEN%s' % seed, data, volumes)
+        generator._pay_advances(data['advances'])
+        data['settlements'] = generator._generate_settlements(rng, data['advances'], volumes)
+        return data
+
+    def _generate_advances(self, rng, tag, data, volumes):
+        today = fields.Date.context_today(self)
+        employees = data['employees']
+        products = data['products']
+
+        def advance_vals():
+            for index in range(volumes['advances']):
+                employee = employees[rng.randrange(len(employees))]
+                date_since = today - datetime.timedelta(days=rng.randrange(max(volumes['days'], 1)))
+                yield {
+                    'name': '%s Advance %s' % (tag, index),
+                    'employee_id': employee.id,
+                    'destination': 'Destination %s' % rng.randrange(100),
+                    'justification': 'Business trip %s' % index,
+                    'date_since': date_since,
+                    'date_up': date_since + datetime.timedelta(days=rng.randrange(1, 10)),
+                    'overnight': rng.random() < 0.5,
+                    'type_ticket': rng.choice(['air', 'land_bus', 'land_car']),
+                    'expense_line_ids': [Command.create({
+                        'name': '%s Advance %s line %s' % (tag, index, line),
+                        'employee_id': employee.id,
+                        'product_id': products[rng.randrange(len(products))].id,
+                        'total_amount_currency': round(rng.uniform(20.0, 1500.0), 2),
+                        'date': date_since,
+                    }) for line in range(max(volumes['advance_lines'], 1))],
+                }
+
+        return self._create_in_batches('hr.expense.sheet', 'name', advance_vals())
+
+    def _pay_advances(self, advances):
+        """ Submit, approve, post and pay the advances with the standard flow, as they must be paid to be settled """
+        batch_size = self.env.context.get('generator_batch_size') or 2000
+        for batch_ids in split_every(batch_size, advances.ids):
+            batch = advances.browse(batch_ids)
+            # Each step only takes the advances that a previous run has not taken further
+            batch.filtered(lambda sheet: sheet.state == 'draft').action_submit_sheet()
+            batch.filtered(lambda sheet: sheet.state == 'submit')._do_approve()
+            batch.filtered(lambda sheet: sheet.state == 'approve').action_sheet_move_post()
+            moves = batch.filtered(lambda sheet: sheet.state == 'post').account_move_ids.filtered(
+                lambda move: move.state == 'posted' and move.payment_state == 'not_paid'
+            )
+            if moves:
+                self.env['account.payment.register'].with_context(
+                    active_model='account.move', active_ids=moves.ids,
+                ).create({'group_payment': False})._create_payments()
+            self._commit_batch()
+
+    def _generate_settlements(self, rng, advances, volumes):
+        """
+        Settle a share of the advances with `_settle_advances`, as the users do, then fill the real and verified
+        expenses of the settlement lines
+        """
+        settled_ids = [advance_id for advance_id in advances.ids if rng.random() < volumes['settled_ratio']]
+        settlement_ids = []
+        batch_size = self.env.context.get('generator_batch_size') or 2000
+        for batch_ids in split_every(batch_size, settled_ids):
+            batch = advances.browse(batch_ids)
+            batch.filtered(lambda advance: advance.state == 'done' and not advance.settled_report)._settle_advances()
+            # Settlements of the previous runs included, in the order of the advances
+            settlements = self.env['hr.expense.sheet'].search(
+                [('is_liquidation', '=', True), ('original_sheet_id', 'in', batch.ids)],
+                order='original_sheet_id, id',
+            )
+            for line in settlements.expense_line_ids:
+                line.write({
+                    'real_expenses': round(line.total_amount_currency * rng.uniform(0.7, 1.2), 2),
+                    'verified': rng.random() < 0.8,
+                })
+            settlement_ids.extend(settlements.ids)
+            self._commit_batch()
+        return self.env['hr.expense.sheet'].browse(settlement_ids)
@@ -1,5 +1,5 @@
 from odoo import models, fields, api
-from odoo.exceptions import ValidationError
+from odoo.tools import SQL
 
 
 class ExpenseLiquidationReport(models.Model):
@@ -14,18 +14,40 @@ class ExpenseLiquidationReport(models.Model):
         tracking = True
     )
 
-    @api.constrains('expense_sheet_id')
-    def _check_unique_expense_sheet(self):
-        for record in self:
-            if record.expense_sheet_id:
-                existing = self.search([
-                    ('expense_sheet_id', '=', record.expense_sheet_id.id),
-                    ('id', '!=', record.id)
-                ], limit=1)
-                if existing:
-                    raise ValidationError(
-                        'A settlement report already exists for this expense report.'
-                        'Multiple settlements are not allowed for the same report.'
-                    )
+    _sql_constraints = [
+        ('expense_sheet_unique', 'UNIQUE(expense_sheet_id)',
+         'A settlement report already exists for this expense report. '
+         'Multiple settlements are not allowed for the same report.'),
+    ]
 
+    @api.model
+    def _generate_reports(self, date_from, date_to):
+        """
+        Create the reports of the settlements of the allowed companies dated between `date_from` and `date_to`
+        (accounting date, or creation date while they have none) with a single INSERT. The settlements that already
+        have a report are skipped.
 
+        The rows are inserted in SQL: only the access rights of the model are checked, the record rules and the
+        overrides of `create` are bypassed, and no creation message is logged in the chatter of the reports.
+        :return: the created reports
+        """
+        self.check_access('create')
+        self.env['hr.expense.sheet'].flush_model(['is_liquidation', 'accounting_date', 'company_id'])
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO hr_expense_liquidation_report (expense_sheet_id, create_uid, create_date, write_uid, write_date)
+            SELECT sheet.id, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM hr_expense_sheet sheet
+             WHERE sheet.is_liquidation
+               AND sheet.company_id = ANY(%(company_ids)s)
+               AND COALESCE(sheet.accounting_date, sheet.create_date::date) BETWEEN %(date_from)s AND %(date_to)s
+             ORDER BY sheet.id
+                ON CONFLICT (expense_sheet_id) DO NOTHING
+         RETURNING id
+            """,
+            uid=self.env.uid,
+            company_ids=self.env.companies.ids,
+            date_from=date_from,
+            date_to=date_to,
+        ))
+        return self.browse(report_id for report_id, in self.env.cr.fetchall())
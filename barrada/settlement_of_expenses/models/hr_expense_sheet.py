@@ -4,6 +4,8 @@ from odoo.exceptions import UserError, ValidationError
 from markupsafe import Markup
 import pytz
 
+from odoo.addons.account_area_expense.models.account_area_expense_stat import instrumented
+
 
 class HrExpenseSheet(models.Model):
     _inherit = 'hr.expense.sheet'
@@ -26,7 +28,7 @@ class HrExpenseSheet(models.Model):
 
     refund = fields.Monetary(
         string='Refund',
-        #compute='_compute_diferenc',
+        compute='_compute_totals_liquidation',
         store=True,
         readonly=True,
         help='Negative: employee owes money to the company\nPositive: company owes money to employee'
@@ -48,7 +50,7 @@ class HrExpenseSheet(models.Model):
 
     total_verified_expenses = fields.Monetary(
         string='Verified Expenses',
-        #compute='_compute_total_expenses_verified',
+        compute='_compute_total_verified_expenses',
         store=False,
         help='Amount visible only when verified'
     )
@@ -104,11 +106,55 @@ class HrExpenseSheet(models.Model):
         readonly=True
     )
 
+    total_real_expenses = fields.Monetary(
+        string='Total Real Expenses',
+        compute='_compute_totals_liquidation',
+        store=True,
+        readonly=True
+    )
+
     settled_report = fields.Boolean("Settled report", default=False)
 
+    # Last background job of the sheet, see account.area.expense.job
+    background_job_id = fields.Many2one('account.area.expense.job', "Background Job", readonly=True, copy=False,
+                                        index='btree_not_null', ondelete='set null')
+    background_job_state = fields.Selection(related='background_job_id.state', string="Background Status")
+
+    @api.depends('expense_line_ids.verified', 'expense_line_ids.real_expenses', 'expense_line_ids.refund')
     def _compute_totals_liquidation(self):
+        """ Totals of the lines, read with one grouped query for all the saved sheets """
+        totals = {}
+        sheets = self.filtered('id')
+        if sheets:
+            for sheet, verified, real_expenses, refund in self.env['hr.expense']._read_group(
+                [('sheet_id', 'in', sheets.ids)],
+                ['sheet_id', 'verified'],
+                ['real_expenses:sum', 'refund:sum'],
+            ):
+                real_expenses, refund = real_expenses or 0.0, refund or 0.0
+                real_total, verified_total, refund_total = totals.get(sheet.id, (0.0, 0.0, 0.0))
+                totals[sheet.id] = (
+                    real_total + real_expenses,
+                    verified_total + (real_expenses if verified else 0.0),
+                    refund_total + refund,
+                )
         for rec in self:
-            rec.total_experiences_verified = 0
+            if rec.id:
+                real_total, verified_total, refund_total = totals.get(rec.id, (0.0, 0.0, 0.0))
+            else:
+                # Sheet being edited in a form: its lines are not in the database yet
+                lines = rec.expense_line_ids
+                real_total = sum(lines.mapped('real_expenses'))
+                verified_total = sum(lines.filtered('verified').mapped('real_expenses'))
+                refund_total = sum(lines.mapped('refund'))
+            rec.total_real_expenses = real_total
+            rec.total_experiences_verified = verified_total
+            rec.refund = refund_total
+
+    @api.depends('verified', 'total_experiences_verified')
+    def _compute_total_verified_expenses(self):
+        for rec in self:
+            rec.total_verified_expenses = rec.total_experiences_verified if rec.verified else 0.0
 
 
     # ========== METHODS ==========
@@ -146,88 +192,139 @@ class HrExpenseSheet(models.Model):
                 record.liquidation_status = 'liquidated'
 
 
+    @instrumented('action_settle_advance')
     def action_settle_advance(self):
         """Crear hoja de liquidación para el anticipo"""
-
         self.ensure_one()
+        new_sheet = self._settle_advances()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'hr.expense.sheet',
+            'res_id': new_sheet.id,
+            'view_mode': 'form',
+            'target': 'current',
+            'name': _('Settlement Sheet'),
+        }
+
+    @instrumented('action_settle_advances')
+    def action_settle_advances(self):
+        """Liquidar varios anticipos a la vez y mostrar las liquidaciones creadas"""
+        settlements = self._settle_advances()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'hr.expense.sheet',
+            'views': [[False, 'list'], [False, 'form']],
+            'domain': [('id', 'in', settlements.ids)],
+            'target': 'current',
+            'name': _('Settlement Sheets'),
+        }
 
+    def _settle_advances(self):
+        """
+        Create the settlement sheets of the advances: the expense lines of all the advances are copied with one
+        `copy_data`, the settlements are created with one `create` and the cross-link messages are logged in batch.
+        :return: the settlement sheets, in the order of the advances
+        """
         # Validar estado
-        if self.state != 'done':
+        if any(sheet.state != 'done' for sheet in self):
             raise UserError(_('Advances can only be settled on forms with a status of "Approved"'))
 
+        # Validar que no se liquide una liquidación, como en la liquidación en segundo plano
+        liquidations = self.filtered('is_liquidation')
+        if liquidations:
+            raise UserError(_('Settlement sheets cannot be settled:\n%s') % '\n'.join(liquidations.mapped('name')))
+
         # Validar que no exista ya una liquidación
-        if self.settled_report:
+        settled = self.filtered('settled_report')
+        if settled:
             raise UserError(_('This sheet already has an associated settlement.:\n%s') %
-                            self.settlement_sheet_id.name)
+                            '\n'.join(settled.settlement_sheet_id.mapped('name') or settled.mapped('name')))
 
-        # Preparar líneas de gasto duplicadas (sin ID para crear nuevas)
-        expense_lines = []
-        for line in self.expense_line_ids:
-            # Usar copy_data() para preservar todos los campos incluyendo personalizados
-            line_data = line.copy_data()[0]
+        # Preparar líneas de gasto duplicadas (sin ID para crear nuevas), copiadas todas a la vez
+        lines = self.expense_line_ids
+        lines_data = dict(zip(lines.ids, lines.copy_data()))
+        for line_data in lines_data.values():
             # Eliminar campos que no deben copiarse o que se asignarán automáticamente
             line_data.pop('sheet_id', None)
             line_data.pop('id', None)
-            expense_lines.append((0, 0, line_data))
 
-        # Crear nueva hoja de liquidación con líneas y campos personalizados
-        vals = {
-            'name': _('SETTLEMENT %s') % self.name,
-            'employee_id': self.employee_id.id,
+        # Crear las hojas de liquidación con líneas y campos personalizados
+        settlements = self.env['hr.expense.sheet'].create([{
+            'name': _('SETTLEMENT %s') % advance.name,
+            'employee_id': advance.employee_id.id,
             'is_liquidation': True,
-            'original_sheet_id': self.id,
-            'destination': self.destination,
-            'justification': self.justification,
-            'real_expenses': self.real_expenses,
-            'total_verified_expenses': self.total_verified_expenses,
-            'verified': self.verified,
-            'supporting_documents': self.supporting_documents,
-            'overnight': self.overnight,
-            'date_since': self.date_since,
-            'date_up': self.date_up,
-            'number_days': self.number_days,
-            'type_ticket':self.type_ticket,
-            'flight_date': self.flight_date,
-            'airline': self.airline,
-            'route': self.route,
-            'flight': self.flight,
-            'expense_line_ids': expense_lines,  # Incluir todas las líneas duplicadas
-        }
-
-        new_sheet = self.env['hr.expense.sheet'].create([vals])
+            'original_sheet_id': advance.id,
+            'destination': advance.destination,
+            'justification': advance.justification,
+            'real_expenses': advance.real_expenses,
+            'verified': advance.verified,
+            'supporting_documents': advance.supporting_documents,
+            'overnight': advance.overnight,
+            'date_since': advance.date_since,
+            'date_up': advance.date_up,
+            'number_days': advance.number_days,
+            'type_ticket': advance.type_ticket,
+            'flight_date': advance.flight_date,
+            'airline': advance.airline,
+            'route': advance.route,
+            'flight': advance.flight,
+            'expense_line_ids': [Command.create(lines_data[line.id]) for line in advance.expense_line_ids],
+        } for advance in self])
         self.settled_report = True
 
-        # Obtener fecha actual en la zona horaria del usuario
-        user_tz = self.env.user.tz or 'UTC'
-        now_utc = fields.Datetime.now()
-        # Convertir de UTC a la zona horaria del usuario
-        user_timezone = pytz.timezone(user_tz)
-        now_user_tz = pytz.utc.localize(now_utc).astimezone(user_timezone)
-        settlement_date = now_user_tz.strftime('%d/%m/%Y %H:%M:%S')
-
-        # Mensaje en el reporte original con hipervínculo a la liquidación
-        self.message_post(
-            body=Markup(_('Report created on %s: <a href="/web#id=%s&amp;model=hr.expense.sheet&amp;view_type=form">%s</a>')) %
-                 (settlement_date, new_sheet.id, new_sheet.name),
-            subtype_xmlid='mail.mt_note'
+        # Fecha actual en la zona horaria del usuario, calculada una sola vez
+        user_timezone = pytz.timezone(self.env.user.tz or 'UTC')
+        settlement_date = pytz.utc.localize(fields.Datetime.now()).astimezone(user_timezone).strftime('%d/%m/%Y %H:%M:%S')
+
+        # Mensajes con hipervínculo entre cada anticipo y su liquidación
+        advance_body = Markup(_('Report created on %s: <a href="/web#id=%s&amp;model=hr.expense.sheet&amp;view_type=form">%s</a>'))
+        settlement_body = Markup(_('Settlement created on %s for advance: <a href="/web#id=%s&amp;model=hr.expense.sheet&amp;view_type=form">%s</a>'))
+        subtype_id = self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note')
+        self._message_log_batch(
+            bodies={
+                advance.id: advance_body % (settlement_date, settlement.id, settlement.name)
+                for advance, settlement in zip(self, settlements)
+            },
+            subtype_id=subtype_id,
         )
-
-        # Mensaje en la nueva liquidación con hipervínculo al reporte original
-        new_sheet.message_post(
-            body=Markup(_('Settlement created on %s for advance: <a href="/web#id=%s&amp;model=hr.expense.sheet&amp;view_type=form">%s</a>')) %
-                 (settlement_date, self.id, self.name),
-            subtype_xmlid='mail.mt_note'
+        settlements._message_log_batch(
+            bodies={
+                settlement.id: settlement_body % (settlement_date, advance.id, advance.name)
+                for advance, settlement in zip(self, settlements)
+            },
+            subtype_id=subtype_id,
         )
+        return settlements
 
-        return {
-            'type': 'ir.actions.act_window',
-            'res_model': 'hr.expense.sheet',
-            'res_id': new_sheet.id,
-            'view_mode': 'form',
-            'target': 'current',
-            'name': _('Settlement Sheet'),
-        }
+    def action_settle_advance_in_background(self):
+        """ Settle the selected advances in background, the sheets that cannot be settled are ignored """
+        advances = self.filtered(lambda sheet: sheet.state == 'done' and not sheet.settled_report and not sheet.is_liquidation)
+        if not advances:
+            raise UserError(_('None of the selected sheets is an advance waiting to be settled.'))
+        jobs = self.env['account.area.expense.job']._enqueue(advances, '_settle_advances', name=_('Settle advances'))
+        return self.env['account.area.expense.job']._get_enqueued_notification(jobs)
+
+    @instrumented('action_approve_expense_sheets')
+    def action_approve_expense_sheets(self):
+        return super().action_approve_expense_sheets()
+
+    @instrumented('_do_create_moves')
+    def _do_create_moves(self):
+        return super()._do_create_moves()
+
+    @instrumented('action_sheet_move_post')
+    def action_sheet_move_post(self):
+        return super().action_sheet_move_post()
+
+    @instrumented('action_register_payment')
+    def action_register_payment(self):
+        return super().action_register_payment()
+
+    @instrumented('action_reset_expense_sheets')
+    def action_reset_expense_sheets(self):
+        return super().action_reset_expense_sheets()
 
+    @instrumented('_prepare_bills_vals')
     def _prepare_bills_vals(self):
         self.ensure_one()
         move_vals = self._prepare_move_vals()
@@ -237,14 +334,15 @@ class HrExpenseSheet(models.Model):
         move_type = 'in_invoice'
         partner_id = self.employee_id.sudo().work_contact_id.id
         journal_invoice = self.journal_id.id
+        settings = self.company_id._get_expense_settings()
+        if settings['claim_use_same_journal'] and settings['expense_journal_id']:
+            journal_invoice = settings['expense_journal_id']
 
         if self.is_liquidation and self.total_amount > 0:
             move_type = 'out_invoice'
             partner_id = self.employee_id.sudo().user_id.id
-            journal_id_str = self.env['ir.config_parameter'].sudo().get_param('hr_expense.reimbursement_journal_id')
-            journal_id = int(journal_id_str) if journal_id_str else False
-            if journal_id:
-                journal_invoice = journal_id
+            if settings['reimbursement_journal_id']:
+                journal_invoice = settings['reimbursement_journal_id']
 
         return {
             **move_vals,
@@ -256,8 +354,8 @@ class HrExpenseSheet(models.Model):
             'currency_id': self.currency_id.id,
             'line_ids': [Command.create(expense._prepare_move_lines_vals()) for expense in self.expense_line_ids],
             'attachment_ids': [
-                Command.create(attachment.copy_data({'res_model': 'account.move', 'res_id': False, 'raw': attachment.raw})[0])
-                for attachment in self.expense_line_ids.attachment_ids
+                Command.link(attachment.id)
+                for attachment in self.expense_line_ids.attachment_ids.sudo()._copy_with_shared_blob({'res_model': 'account.move', 'res_id': False})
             ],
         }
 
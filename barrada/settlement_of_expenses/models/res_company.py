@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields
+from odoo import models, fields, tools
+from odoo.tools.misc import frozendict
+
+# Company fields read by `_get_expense_settings`
+EXPENSE_SETTINGS_FIELDS = {'expense_reimbursement_journal_id', 'expense_claim_use_same_journal', 'expense_journal_id'}
 
 
 class ResCompany(models.Model):
@@ -10,4 +14,33 @@ class ResCompany(models.Model):
         help='By enabling this option, invoices generated from expense claims will '
              'use the same accounting journal configured in "Expense Journal".',
         default=False
-    )
\ No newline at end of file
+    )
+
+    expense_reimbursement_journal_id = fields.Many2one(
+        'account.journal',
+        string='Reimbursement Journal',
+        check_company=True,
+        domain="[('type', '=', 'sale')]",
+        help='Default accounting journal for expense reimbursement.'
+    )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if EXPENSE_SETTINGS_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    @tools.ormcache('self.id')
+    def _get_expense_settings(self):
+        """
+        Journal settings of the company used when creating the entries of the expense reports, so that bills of many
+        sheets do not read them once per sheet. The cache is cleared when one of `EXPENSE_SETTINGS_FIELDS` is written.
+        :return: a frozendict with the ids of the reimbursement and expense journals and the claim journal policy
+        """
+        self.ensure_one()
+        company = self.sudo()
+        return frozendict({
+            'reimbursement_journal_id': company.expense_reimbursement_journal_id.id,
+            'claim_use_same_journal': company.expense_claim_use_same_journal,
+            'expense_journal_id': company.expense_journal_id.id,
+        })
@@ -9,14 +9,14 @@ class ResConfigSettings(models.TransientModel):
     expense_reimbursement_journal_id = fields.Many2one(
         'account.journal',
         string='Reimbursement Log',
-        config_parameter='hr_expense.reimbursement_journal_id',
+        related='company_id.expense_reimbursement_journal_id',
         readonly=False,
         domain="[('type', '=', 'sale'), ('company_id', '=', company_id)]",
         help='Default accounting journal for expense reimbursement.'
     )
 
     expense_claim_use_same_journal = fields.Boolean(
-        config_parameter='company_id.expense_claim_use_same_journal',
+        related='company_id.expense_claim_use_same_journal',
         readonly=False,
         help='Claim invoices will use the same employee expense journal'
     )
@@ -0,0 +1,4 @@
+from . import test_hr_expense_liquidation_report
+from . import test_hr_expense_sheet
+from . import test_performance
+from . import test_res_company
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from odoo import Command
+from odoo.addons.account_area_expense.tests.common import AccountAreaExpenseCommon
+
+
+class SettlementOfExpensesCommon(AccountAreaExpenseCommon):
+
+    def _create_advances(self, size, state='draft'):
+        """ Create `size` advances of one expense each, taken to `state` through the buttons of the sheet form """
+        advances = self.env['hr.expense.sheet'].create([{
+            'name': 'Advance %s' % index,
+            'employee_id': self.area_employee.id,
+            'destination': 'Destination %s' % index,
+            'justification': 'Business trip %s' % index,
+            'expense_line_ids': [Command.create({
+                'name': 'Advance %s line' % index,
+                'employee_id': self.area_employee.id,
+                'product_id': self.area_product.id,
+                'total_amount_currency': next(self.expense_amounts),
+            })],
+        } for index in range(size)])
+        return self._advance_sheets(advances, state)
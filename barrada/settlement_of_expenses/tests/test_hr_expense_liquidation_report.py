@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from psycopg2 import IntegrityError
+
+from odoo.service.model import _as_validation_error
+from odoo.tests import tagged
+from odoo.tools import mute_logger
+
+from .common import SettlementOfExpensesCommon
+
+
+@tagged('post_install', '-at_install')
+class TestHrExpenseLiquidationReport(SettlementOfExpensesCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Report = self.env['hr.expense.liquidation.report']
+
+    def _create_settlements(self, accounting_dates):
+        settlements = self._create_advances(len(accounting_dates))
+        for settlement, accounting_date in zip(settlements, accounting_dates):
+            settlement.write({'is_liquidation': True, 'accounting_date': accounting_date})
+        return settlements
+
+    def test_expense_sheet_unique(self):
+        settlement = self._create_settlements([date(2024, 1, 15)])
+        self.Report.create({'expense_sheet_id': settlement.id})
+        with mute_logger('odoo.sql_db'), self.assertRaises(IntegrityError) as capture, self.cr.savepoint():
+            self.Report.create({'expense_sheet_id': settlement.id})
+            self.env.flush_all()
+        self.assertIn(
+            'A settlement report already exists for this expense report. '
+            'Multiple settlements are not allowed for the same report.',
+            str(_as_validation_error(self.env, capture.exception)),
+        )
+
+    def test_generate_reports(self):
+        before, first, inside, last, after = settlements = self._create_settlements([
+            date(2024, 1, 31), date(2024, 2, 1), date(2024, 2, 15), date(2024, 2, 29), date(2024, 3, 1),
+        ])
+        advance = self._create_advances(1)
+        advance.accounting_date = date(2024, 2, 15)
+        existing = self.Report.create({'expense_sheet_id': inside.id})
+        self.env.flush_all()
+        # Warm the access rights cache: the reports are then created with the INSERT only
+        self.Report._generate_reports(date(2000, 1, 1), date(2000, 1, 1))
+
+        with self.assertQueryCount(1):
+            reports = self.Report._generate_reports(date(2024, 2, 1), date(2024, 2, 29))
+
+        self.assertEqual(reports.expense_sheet_id, first | last)
+        self.assertEqual(self.Report.search([('expense_sheet_id', 'in', settlements.ids)]), existing | reports)
+        self.assertFalse(self.Report._generate_reports(date(2024, 2, 1), date(2024, 2, 29)))
+        self.assertFalse(self.Report.search([('expense_sheet_id', 'in', (before | after | advance).ids)]))
+
+    def test_generate_reports_allowed_companies(self):
+        settlement = self._create_settlements([date(2024, 2, 15)])
+        other_company = self.env['res.company'].create({'name': 'Other Settlement Company'})
+        self.env.user.company_ids |= other_company
+
+        Report = self.Report.with_context(allowed_company_ids=other_company.ids)
+        self.assertFalse(Report._generate_reports(date(2024, 2, 1), date(2024, 2, 29)))
+
+        Report = self.Report.with_context(allowed_company_ids=(other_company | settlement.company_id).ids)
+        self.assertEqual(Report._generate_reports(date(2024, 2, 1), date(2024, 2, 29)).expense_sheet_id, settlement)
+
+    def test_generate_wizard(self):
+        settlement = self._create_settlements([date(2024, 2, 15)])
+        wizard = self.env['hr.expense.liquidation.report.generate'].create({
+            'date_from': date(2024, 2, 1),
+            'date_to': date(2024, 2, 29),
+        })
+        action = wizard.action_generate()
+        self.assertEqual(self.Report.search(action['domain']).expense_sheet_id, settlement)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from odoo import Command
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.account_area_expense.tests.common import SIZES
+from .common import SettlementOfExpensesCommon
+
+TOTAL_FIELDS = ['total_real_expenses', 'total_experiences_verified', 'refund']
+
+
+@tagged('post_install', '-at_install')
+class TestHrExpenseSheet(SettlementOfExpensesCommon):
+
+    def assertTotals(self, sheet, real_expenses, verified, refund):
+        self.assertRecordValues(sheet, [{
+            'total_real_expenses': real_expenses,
+            'total_experiences_verified': verified,
+            'refund': refund,
+        }])
+
+    def test_compute_totals_liquidation_line_edits(self):
+        sheet = self._create_advances(1)
+        line = sheet.expense_line_ids
+        line.total_amount_currency = 100.0
+        self.assertTotals(sheet, 0.0, 0.0, 100.0)
+
+        line.real_expenses = 80.0
+        self.assertTotals(sheet, 80.0, 0.0, 20.0)
+
+        line.verified = True
+        self.assertTotals(sheet, 80.0, 80.0, 20.0)
+
+        line.total_amount_currency = 120.0
+        self.assertTotals(sheet, 80.0, 80.0, 40.0)
+
+        sheet.expense_line_ids = [Command.create({
+            'name': 'Unverified line',
+            'employee_id': self.area_employee.id,
+            'product_id': self.area_product.id,
+            'total_amount_currency': 50.0,
+            'real_expenses': 30.0,
+        })]
+        self.assertTotals(sheet, 110.0, 80.0, 60.0)
+
+        line.verified = False
+        self.assertTotals(sheet, 110.0, 0.0, 60.0)
+
+    def test_compute_totals_liquidation_query_count(self):
+        """ The lines of all the sheets are summed with one grouped query: the batch costs the queries of one sheet """
+        reference = None
+        for size in SIZES:
+            with self.subTest(size=size):
+                sheets = self._create_advances(size)
+                sheets.expense_line_ids.write({'real_expenses': 1.0, 'verified': True})
+                self.env.flush_all()
+                self.env.invalidate_all()
+                for fname in TOTAL_FIELDS:
+                    self.env.add_to_compute(sheets._fields[fname], sheets)
+
+                if reference is None:
+                    queries = self.cr.sql_log_count
+                    sheets._recompute_recordset(TOTAL_FIELDS)
+                    reference = self.cr.sql_log_count - queries
+                else:
+                    with self.assertQueryCount(reference, flush=False):
+                        sheets._recompute_recordset(TOTAL_FIELDS)
+
+                for sheet in sheets:
+                    line = sheet.expense_line_ids
+                    self.assertTotals(sheet, 1.0, 1.0, line.total_amount - 1.0)
+
+    def test_settle_advances(self):
+        advances = self._create_advances(3, 'done')
+        settlements = advances._settle_advances()
+
+        self.assertEqual(len(settlements), len(advances))
+        self.assertEqual(settlements.mapped('original_sheet_id').ids, advances.ids)
+        self.assertTrue(all(advances.mapped('settled_report')))
+        self.assertTrue(all(settlements.mapped('is_liquidation')))
+        for advance, settlement in zip(advances, settlements):
+            with self.subTest(advance=advance.name):
+                self.assertFalse(settlement.expense_line_ids & advance.expense_line_ids)
+                self.assertEqual(
+                    settlement.expense_line_ids.mapped(lambda line: (line.name, line.product_id, line.total_amount_currency)),
+                    advance.expense_line_ids.mapped(lambda line: (line.name, line.product_id, line.total_amount_currency)),
+                )
+                for record, other in ((advance, settlement), (settlement, advance)):
+                    link = '/web#id=%s&amp;model=hr.expense.sheet' % other.id
+                    notes = record.message_ids.filtered(lambda message: link in str(message.body))
+                    self.assertEqual(len(notes), 1)
+                    self.assertEqual(notes.subtype_id, self.env.ref('mail.mt_note'))
+
+    def test_settle_advances_rejected(self):
+        settled = self._create_advances(1, 'done')
+        settled._settle_advances()
+        liquidation, advance = self._create_advances(2, 'done')
+        liquidation.is_liquidation = True
+
+        for selection in (advance | settled, advance | liquidation):
+            with self.subTest(selection=selection.mapped('name')), self.assertRaises(UserError):
+                selection._settle_advances()
+        self.assertFalse(advance.settled_report)
+        self.assertFalse(self.env['hr.expense.sheet'].search([('original_sheet_id', '=', advance.id)]))
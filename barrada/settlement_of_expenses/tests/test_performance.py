@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from .common import SettlementOfExpensesCommon
+
+
+@tagged('post_install', '-at_install', '-standard', 'perf')
+class TestSettlementOfExpensesPerformance(SettlementOfExpensesCommon):
+    """ Query and time budgets of the advance and settlement flow, each step being run on 1, 100 and 1,000 records """
+
+    def test_perf_submit(self):
+        self._assert_scaling(
+            self._create_advances,
+            lambda advances: advances.action_submit_sheet(),
+        )
+
+    def test_perf_approve(self):
+        self._assert_scaling(
+            lambda size: self._create_advances(size, 'submit'),
+            lambda advances: advances.action_approve_expense_sheets(),
+        )
+
+    def test_perf_do_create_moves(self):
+        self._assert_scaling(
+            lambda size: self._create_advances(size, 'approve'),
+            lambda advances: advances._do_create_moves(),
+        )
+
+    def test_perf_action_sheet_move_post(self):
+        # Each bill takes its number from the journal sequence on its own when posted
+        self._assert_scaling(
+            lambda size: self._create_advances(size, 'approve'),
+            lambda advances: advances.action_sheet_move_post(),
+            queries_per_record=2, seconds_per_record=0.01,
+        )
+
+    def test_perf_register_payment(self):
+        # One payment is created per bill, then numbered, posted and reconciled with its bill on its own
+        self._assert_scaling(
+            lambda size: self._create_advances(size, 'post'),
+            self._register_payment,
+            queries_per_record=8, seconds_per_record=0.02,
+        )
+
+    def test_perf_reset_expense_sheets(self):
+        # Each bill is reversed by a credit note numbered and reconciled with it on its own
+        self._assert_scaling(
+            lambda size: self._create_advances(size, 'post'),
+            lambda advances: advances.action_reset_expense_sheets(),
+            queries_per_record=8, seconds_per_record=0.02,
+        )
+
+    def test_perf_settle_advance(self):
+        # The form button settles one advance, the list action settles the selection with the same queries
+        self._assert_scaling(
+            lambda size: self._create_advances(size, 'done'),
+            lambda advances: advances.action_settle_advance() if len(advances) == 1 else advances.action_settle_advances(),
+        )
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import SettlementOfExpensesCommon
+
+
+@tagged('post_install', '-at_install')
+class TestResCompanyExpenseSettings(SettlementOfExpensesCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company_data['company'].expense_reimbursement_journal_id = cls.company_data['default_journal_sale']
+        cls.other_company_data = cls.setup_other_company()
+        other_company = cls.other_company_data['company']
+        other_company.expense_reimbursement_journal_id = cls.other_company_data['default_journal_sale']
+        cls.other_employee = cls.env['hr.employee'].create({
+            'name': 'Other Area Employee',
+            'user_id': cls.env.user.id,
+            'work_contact_id': cls.env.user.partner_id.id,
+            'company_id': other_company.id,
+        })
+
+    def _create_settlements(self, size):
+        """ Settlements giving money back to the company: their bills go to the reimbursement journal """
+        settlements = self._create_advances(size)
+        settlements.is_liquidation = True
+        return settlements
+
+    def test_reimbursement_journal_per_company(self):
+        settlement = self._create_settlements(1)
+        other_company = self.other_company_data['company']
+        other_settlement = self.env['hr.expense.sheet'].with_company(other_company).create({
+            'name': 'Other settlement',
+            'employee_id': self.other_employee.id,
+            'company_id': other_company.id,
+            'is_liquidation': True,
+            'expense_line_ids': [Command.create({
+                'name': 'Other settlement line',
+                'employee_id': self.other_employee.id,
+                'product_id': self.area_product.id,
+                'total_amount_currency': next(self.expense_amounts),
+                'company_id': other_company.id,
+            })],
+        })
+
+        self.assertEqual(settlement._prepare_bills_vals()['journal_id'], self.company_data['default_journal_sale'].id)
+        self.assertEqual(
+            other_settlement._prepare_bills_vals()['journal_id'], self.other_company_data['default_journal_sale'].id,
+        )
+
+    def test_settings_change_in_transaction(self):
+        settlement = self._create_settlements(1)
+        self.assertEqual(settlement._prepare_bills_vals()['journal_id'], self.company_data['default_journal_sale'].id)
+
+        journal = self.company_data['default_journal_sale'].copy({'name': 'Reimbursements', 'code': 'RMB'})
+        self.env['res.config.settings'].create({'expense_reimbursement_journal_id': journal.id}).execute()
+        self.assertEqual(settlement._prepare_bills_vals()['journal_id'], journal.id)
+
+        self.company_data['company'].expense_reimbursement_journal_id = False
+        self.assertEqual(settlement._prepare_bills_vals()['journal_id'], settlement.journal_id.id)
+
+    def test_prepare_bills_vals_query_count(self):
+        """ The settings of the company are read once for all the bills of its sheets """
+        reference = None
+        for size in (1, 10):
+            with self.subTest(size=size):
+                settlements = self._create_settlements(size)
+                self.env.flush_all()
+                self.env.invalidate_all()
+                if reference is None:
+                    reference, _duration = self._measure(
+                        lambda settlements: [settlement._prepare_bills_vals() for settlement in settlements],
+                        settlements,
+                    )
+                else:
+                    with self.assertQueryCount(reference):
+                        bills_vals = [settlement._prepare_bills_vals() for settlement in settlements]
+                    self.assertEqual(
+                        {vals['journal_id'] for vals in bills_vals}, {self.company_data['default_journal_sale'].id},
+                    )
@@ -0,0 +1 @@
+from . import hr_expense_liquidation_report_generate
@@ -0,0 +1,29 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class ExpenseLiquidationReportGenerate(models.TransientModel):
+    """ Create the liquidation reports of the settlements of a period at once """
+    _name = 'hr.expense.liquidation.report.generate'
+    _description = 'Generate Liquidation Reports'
+
+    date_from = fields.Date("From", required=True, default=lambda self: fields.Date.today().replace(day=1))
+    date_to = fields.Date("To", required=True, default=fields.Date.context_today)
+
+    @api.constrains('date_from', 'date_to')
+    def _check_dates(self):
+        if any(wizard.date_from > wizard.date_to for wizard in self):
+            raise UserError(_("Incorrect date range."))
+
+    def action_generate(self):
+        self.ensure_one()
+        reports = self.env['hr.expense.liquidation.report']._generate_reports(self.date_from, self.date_to)
+        if not reports:
+            raise UserError(_("Every settlement of the period already has a liquidation report."))
+        return {
+            'name': _("Liquidation Reports"),
+            'type': 'ir.actions.act_window',
+            'res_model': 'hr.expense.liquidation.report',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', reports.ids)],
+        }